@@ -0,0 +1,557 @@
+#!/usr/bin/env python3
+# bench_catalogo.py
+# Mediciones de rendimiento de catalogo_html.py con datos sintéticos.
+# Uso: python bench_catalogo.py [excel] [normalize] [tarjetas] [arranque] [cache_http] [pipeline]
+# "pipeline" guarda sus resultados en HISTORIAL y termina con error si detecta una regresión.
+
+import contextlib
+import datetime
+import email.utils
+import hashlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unicodedata
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+
+import html
+
+import catalogo_html
+
+# -------------------------
+# Datos sintéticos
+# -------------------------
+
+MODELOS = ["Max Energy", "Pro Max Futsal", "Ultra Torretín", "Dragón", "Barrio", "Street",
+           "Complex", "Esencial Gold (Edición Limitada)", "Neo", "Válo", "Universal", "One"]
+
+def tabla_sintetica(filas, duplicados=0.1, semilla=0):
+    """DataFrame con el aspecto de productos.xlsx: nombre, precio y tallas (con huecos y repetidos)."""
+    rnd = random.Random(semilla)
+    nombres, precios, tallas = [], [], []
+    for i in range(filas):
+        if i and rnd.random() < duplicados:
+            nombre = nombres[rnd.randrange(i)]
+        elif rnd.random() < 0.02:
+            nombre = "  "
+        else:
+            nombre = f"  {rnd.choice(MODELOS)} {i} "
+        nombres.append(nombre)
+        precios.append("" if rnd.random() < 0.05 else str(rnd.randrange(20, 60) * 1000))
+        tallas.append("" if rnd.random() < 0.05 else "39,40,41,42,43")
+    return pd.DataFrame({"nombre_producto": nombres, "precio": precios, "tallas": tallas})
+
+# Palabras con tilde o eñe para los títulos con acentos
+PALABRAS_ACENTUADAS = ["Edición", "Campeón", "Fútbol", "Niño", "Pelé", "Túnel", "Ñandú", "Élite", "Acción", "Básica"]
+
+def catalogo_sintetico(cantidad, acentos=0.3, duplicados=0.05, imagenes=3, semilla=0):
+    """
+    Productos con la forma del products.json de Shopify (id, handle, title, images).
+    `acentos` es la fracción de títulos con alguna palabra acentuada y `duplicados`
+    la de productos que repiten el título de otro (con otro handle), como pasa
+    entre colecciones del mismo proveedor.
+    """
+    rnd = random.Random(semilla)
+    productos = []
+    for i in range(cantidad):
+        if productos and rnd.random() < duplicados:
+            titulo = rnd.choice(productos)["title"]
+        else:
+            titulo = f"{rnd.choice(MODELOS)} {i}"
+            if rnd.random() < acentos:
+                titulo += " " + rnd.choice(PALABRAS_ACENTUADAS)
+        productos.append({
+            "id": i,
+            "handle": f"producto-{i}",
+            "title": titulo,
+            "images": [{"src": f"https://cdn.shopify.com/s/files/1/{i}-{k}.jpg?v=1"} for k in range(imagenes)],
+        })
+    return productos
+
+def excel_sintetico(productos, ruta, cobertura=0.8, variaciones=0.1, sobrantes=0.05, semilla=0):
+    """
+    Escribe un productos.xlsx para `productos`: una fila por cada `cobertura` de
+    ellos (la fracción `variaciones` con mayúsculas, espacios o tildes distintos,
+    para que se emparejen por similitud) y un `sobrantes` de filas sin producto.
+    """
+    rnd = random.Random(semilla)
+    nombres = []
+    for prod in productos:
+        if rnd.random() >= cobertura:
+            continue
+        nombre = prod["title"]
+        if rnd.random() < variaciones:
+            nombre = rnd.choice([nombre.upper(), f"  {nombre}  ", catalogo_html.normalize_text(nombre)])
+        nombres.append(nombre)
+    nombres += [f"Modelo descatalogado {i}" for i in range(int(len(productos) * sobrantes))]
+    rnd.shuffle(nombres)
+    pd.DataFrame({
+        "Nombre": nombres,
+        "Precio": [str(rnd.randrange(20, 60) * 1000) for _ in nombres],
+        "Tallas": ["39,40,41,42,43" for _ in nombres],
+    }).to_excel(ruta, index=False)
+
+class ServidorShopify:
+    """
+    Servidor HTTP local que imita /collections/<nombre>/products.json de Shopify
+    (paginación con page y limit, Last-Modified y 304). Con `etag` también envía
+    ETag y revalida por If-None-Match; sin él, solo por If-Modified-Since.
+    Cada llamada a cambiar() avanza un segundo la fecha de modificación.
+    Se usa con `with`.
+    """
+
+    def __init__(self, colecciones, etag=True):
+        self.colecciones = colecciones
+        self.etag = etag
+        self.peticiones = 0
+        self.no_modificadas = 0
+        self.version = 0
+        servidor = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                servidor.peticiones += 1
+                partes = urlsplit(self.path)
+                consulta = parse_qs(partes.query)
+                nombre = partes.path.strip("/").split("/")[1] if partes.path.count("/") >= 3 else ""
+                pagina = int(consulta.get("page", ["1"])[0])
+                limite = int(consulta.get("limit", ["30"])[0])
+                productos = servidor.colecciones.get(nombre, [])[(pagina - 1) * limite:pagina * limite]
+                cuerpo = json.dumps({"products": productos}).encode("utf-8")
+                etag = '"' + hashlib.md5(cuerpo).hexdigest() + '"'
+                modificado = email.utils.formatdate(1_700_000_000 + servidor.version, usegmt=True)
+                if servidor.etag:
+                    sin_cambios = self.headers.get("If-None-Match") == etag
+                else:
+                    sin_cambios = self.headers.get("If-Modified-Since") == modificado
+                if sin_cambios:
+                    servidor.no_modificadas += 1
+                    self.send_response(304)
+                    if servidor.etag:
+                        self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(cuerpo)))
+                if servidor.etag:
+                    self.send_header("ETag", etag)
+                self.send_header("Last-Modified", modificado)
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+        self._http = ThreadingHTTPServer(("127.0.0.1", 0), Manejador)
+
+    def url(self, coleccion):
+        return f"http://127.0.0.1:{self._http.server_address[1]}/collections/{coleccion}/products.json"
+
+    def cambiar(self, coleccion, productos):
+        self.colecciones[coleccion] = productos
+        self.version += 1
+
+    def __enter__(self):
+        threading.Thread(target=self._http.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._http.shutdown()
+        self._http.server_close()
+
+# -------------------------
+# Implementaciones de referencia
+# -------------------------
+
+def datos_iterrows(df, col_nombre, col_precio, col_tallas):
+    """Versión original de leer_excel: recorre el DataFrame con iterrows()."""
+    datos = {}
+    for _, row in df.iterrows():
+        nombre_raw = str(row.get(col_nombre, "")).strip()
+        if not nombre_raw:
+            continue
+        precio_raw = str(row.get(col_precio, "")).strip() if col_precio else ""
+        tallas_raw = str(row.get(col_tallas, "")).strip() if col_tallas else ""
+        nombre_norm = catalogo_html.normalize_text(nombre_raw)
+        datos[nombre_norm] = (precio_raw if precio_raw else "N/D", tallas_raw if tallas_raw else "Consultar")
+    return datos
+
+def normalize_text_original(s):
+    """Versión original de normalize_text: NFKD y filtro de combinantes carácter a carácter."""
+    if not isinstance(s, str):
+        s = str(s)
+    s = s.strip().lower()
+    s = unicodedata.normalize('NFKD', s)
+    s = ''.join(ch for ch in s if not unicodedata.combining(ch))
+    return s
+
+def normalize_text_referencia(s):
+    """
+    Lo que debe dar normalize_text: la versión original, pero quitando toda marca
+    de categoría M (como /\\p{M}/gu en el JS de la página), no solo las que tienen
+    clase combinante. Difiere de la original en marcas como U+034F, U+0903,
+    U+20DD o U+0E31, que la original conservaba.
+    """
+    if not isinstance(s, str):
+        s = str(s)
+    s = unicodedata.normalize('NFKD', s.strip().lower())
+    return ''.join(ch for ch in s if not unicodedata.category(ch).startswith("M"))
+
+def textos_aleatorios(cantidad, semilla=0):
+    """
+    Textos con letras acentuadas, combinantes sueltos, marcas sin clase combinante
+    (U+034F, U+0903, U+20DD, U+0E31, U+0E33), ligaduras, espacios y no-str.
+    """
+    rnd = random.Random(semilla)
+    alfabeto = ("abcdefghijklmnñopqrstuvwxyzABCDEFGHIJKLMNÑOPQRSTUVWXYZ0123456789 \t\n()-."
+                "áéíóúüÁÉÍÓÚÜàèçÇãõâêôœßİıﬁ½Ⅻ①ＡＢ\u0301\u0308\u0327\u00a0\u2009Ǆǅ"
+                "\u034f\u0903\u20dd\u0e31\u0e33कि")
+    textos = []
+    for _ in range(cantidad):
+        if rnd.random() < 0.05:
+            textos.append(rnd.choice([rnd.randrange(10 ** 6), rnd.random(), None]))
+        else:
+            textos.append("".join(rnd.choice(alfabeto) for _ in range(rnd.randrange(0, 40))))
+    return textos
+
+def tarjeta_fstring(nombre, precio, tallas, imagenes):
+    """Tarjeta con la técnica de la versión original: f-strings anidados y bloque += por imagen."""
+    nombre_esc = html.escape(nombre)
+    precio_esc = html.escape(precio)
+    tallas_esc = html.escape(tallas)
+    precio_num = catalogo_html._precio_numerico(precio)
+    precio_num = "" if precio_num is None else str(precio_num)
+    swiper_id = catalogo_html._MARCA_SWIPER
+
+    bloque = f"""
+  <div class="producto">
+    <h2>{nombre_esc}</h2>
+    <div class="precio">Precio: ₡{precio_esc}</div>
+    <div class="tallas">Tallas disponibles: {tallas_esc}</div>
+    <div class="swiper" id="{swiper_id}">
+      <div class="swiper-wrapper">
+"""
+    if imagenes:
+        for img in imagenes:
+            img_esc = html.escape(img)
+            bloque += f'        <div class="swiper-slide"><img src="{img_esc}" alt="{nombre_esc}" loading="lazy"></div>\n'
+    else:
+        bloque += '        <div class="swiper-slide" style="display:flex;align-items:center;justify-content:center;background:#222;color:#888;">Sin imagen</div>\n'
+
+    bloque += f"""      </div>
+      <div class="swiper-pagination"></div>
+    </div>
+    <button class="boton" type="button" data-agregar data-nombre="{nombre_esc}" data-precio="{precio_esc}" data-precio-num="{precio_num}" data-tallas="{tallas_esc}">🛒 Agregar al carrito</button>
+  </div>
+"""
+    return bloque
+
+def productos_sinteticos(cantidad, semilla=0):
+    """Lista de (nombre, precio, tallas, imagenes) con 0 a 3 imágenes por producto."""
+    rnd = random.Random(semilla)
+    return [(f"{rnd.choice(MODELOS)} {i} \"Edición\" <O'Neil>", str(rnd.randrange(20, 60) * 1000),
+             "39,40,41,42,43", [f"https://cdn.shopify.com/s/files/{i}-{k}.jpg?v=1&w=2" for k in range(rnd.randrange(4))])
+            for i in range(cantidad)]
+
+# -------------------------
+# Benchmarks
+# -------------------------
+
+def medir(funcion, *args, repeticiones=3):
+    """Mejor tiempo (segundos) de varias ejecuciones y el último resultado."""
+    mejor = float("inf")
+    resultado = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion(*args)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor, resultado
+
+def bench_excel(tamanos=(1_000, 10_000, 100_000)):
+    """Compara la conversión tabla -> dict de leer_excel con la versión iterrows()."""
+    print(f"{'filas':>8} {'iterrows':>10} {'vectorizado':>12} {'mejora':>8}")
+    for filas in tamanos:
+        df = tabla_sintetica(filas)
+        cols = catalogo_html._detectar_columnas(df.columns)
+        t_ref, ref = medir(datos_iterrows, df, *cols, repeticiones=1)
+        t_vec, vec = medir(catalogo_html._tabla_a_datos, df, *cols)
+        assert list(vec.items()) == list(ref.items()), "los resultados no coinciden"
+        print(f"{filas:>8} {t_ref:>9.3f}s {t_vec:>11.3f}s {t_ref / t_vec:>7.1f}x")
+
+def bench_normalize(cantidad=200_000):
+    """
+    Comprueba normalize_text contra normalize_text_referencia sobre textos
+    aleatorios (incluidas marcas que la versión original no quitaba) y mide
+    el coste por llamada frente a la original con nombres de producto realistas.
+    """
+    distintos = 0
+    for texto in textos_aleatorios(20_000):
+        assert catalogo_html.normalize_text(texto) == normalize_text_referencia(texto), repr(texto)
+        distintos += normalize_text_referencia(texto) != normalize_text_original(texto)
+    print(f"{distintos} de 20000 textos aleatorios difieren de la original por marcas sin clase combinante")
+
+    rnd = random.Random(1)
+    nombres = [f"  {rnd.choice(MODELOS)} {rnd.randrange(300)} " for _ in range(cantidad)]
+    casos = {
+        "únicos": [f"{n} #{i}" for i, n in enumerate(nombres)],
+        "repetidos": nombres,
+        "solo ASCII": [unicodedata.normalize("NFKD", n).encode("ascii", "ignore").decode() + f" #{i}"
+                       for i, n in enumerate(nombres)],
+    }
+    print(f"{'caso':>11} {'original':>12} {'actual':>12} {'mejora':>8}")
+    for caso, textos in casos.items():
+        catalogo_html._normalizar.cache_clear()
+        t_ref, _ = medir(lambda: [normalize_text_original(t) for t in textos], repeticiones=1)
+        t_act, _ = medir(lambda: [catalogo_html.normalize_text(t) for t in textos], repeticiones=1)
+        print(f"{caso:>11} {t_ref / cantidad * 1e9:>9.0f} ns {t_act / cantidad * 1e9:>9.0f} ns {t_ref / t_act:>7.1f}x")
+
+def bench_tarjetas(tamanos=(1_000, 10_000, 100_000)):
+    """
+    Tarjetas por segundo: plantilla precompilada frente a los f-strings originales.
+    Cada versión se mide varias veces alternando con la otra (el mejor tiempo de
+    cada una), para que una racha de ruido de la máquina no caiga solo en una.
+    """
+    print(f"{'productos':>9} {'f-string':>14} {'plantilla':>14} {'mejora':>8}")
+    for cantidad in tamanos:
+        productos = productos_sinteticos(cantidad)
+        t_ref = t_pla = float("inf")
+        for _ in range(5):
+            t, ref = medir(lambda: [tarjeta_fstring(*p) for p in productos], repeticiones=1)
+            t_ref = min(t_ref, t)
+            t, pla = medir(lambda: [catalogo_html._render_tarjeta(*p) for p in productos], repeticiones=1)
+            t_pla = min(t_pla, t)
+        assert pla == ref, "las tarjetas no coinciden"
+        print(f"{cantidad:>9} {cantidad / t_ref:>10.0f} t/s {cantidad / t_pla:>10.0f} t/s {t_ref / t_pla:>7.2f}x")
+
+# Lo que se mide en un proceso nuevo: importar el módulo y leer el Excel del repo
+_ARRANQUE = """
+import sys, time
+inicio = time.perf_counter()
+import catalogo_html
+importado = time.perf_counter()
+catalogo_html.leer_excel(catalogo_html.EXCEL_FILENAME, usar_cache=False)
+leido = time.perf_counter()
+pesados = sorted(m for m in ("pandas", "requests") if m in sys.modules)
+print(importado - inicio, leido - importado, ",".join(pesados))
+"""
+
+def _importtime(modulo, carpeta):
+    """Tiempo acumulado (ms) de importar `modulo` según python -X importtime."""
+    salida = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+                            cwd=carpeta, capture_output=True, text=True, check=True).stderr
+    for linea in salida.splitlines():
+        partes = [p.strip() for p in linea.split("|")]
+        if len(partes) == 3 and partes[2] == modulo:
+            return int(partes[1]) / 1000
+    raise RuntimeError(f"no se encontró {modulo} en la salida de -X importtime")
+
+def bench_arranque(repeticiones=5):
+    """
+    Arranque en frío: importar catalogo_html y leer productos.xlsx en un proceso
+    nuevo. Falla si alguno de los dos pasos vuelve a cargar pandas o requests.
+    """
+    carpeta = os.path.dirname(os.path.abspath(catalogo_html.__file__))
+    print(f"{'paso':>24} {'mejor':>10}")
+    print(f"{'import (-X importtime)':>24} {min(_importtime('catalogo_html', carpeta) for _ in range(repeticiones)):>7.1f} ms")
+    tiempos = []
+    for _ in range(repeticiones):
+        salida = subprocess.run([sys.executable, "-c", _ARRANQUE], cwd=carpeta,
+                                capture_output=True, text=True, check=True).stdout.split()
+        assert len(salida) == 2, f"se importaron módulos pesados al arrancar: {salida[2]}"
+        tiempos.append((float(salida[0]), float(salida[1])))
+    print(f"{'import catalogo_html':>24} {min(t[0] for t in tiempos) * 1000:>7.1f} ms")
+    print(f"{'leer_excel (ligero)':>24} {min(t[1] for t in tiempos) * 1000:>7.1f} ms")
+    print(f"{'import pandas':>24} {min(_importtime('pandas', carpeta) for _ in range(repeticiones)):>7.1f} ms")
+    print(f"{'import requests':>24} {min(_importtime('requests', carpeta) for _ in range(repeticiones)):>7.1f} ms")
+
+def bench_cache_http(cantidad=250, repeticiones=20):
+    """
+    Comprueba CacheHTTP contra el servidor local, revalidando por ETag y por
+    Last-Modified: acierto sin red dentro del TTL, 304 al revalidar, cuerpo
+    nuevo cuando cambia la colección y copia guardada cuando no hay servidor.
+    Mide el tiempo de cada caso y falla (AssertionError) si algo no se cumple.
+    """
+    import requests
+
+    print(f"{'validador':>13} {'descarga':>10} {'acierto':>10} {'304':>10} {'cambio':>10} {'sin red':>10}")
+    for etag in (True, False):
+        productos = catalogo_sintetico(cantidad)
+        with tempfile.TemporaryDirectory() as carpeta, requests.Session() as sesion:
+            cache = catalogo_html.CacheHTTP(carpeta, ttl=3600)
+            with ServidorShopify({"bench": productos}, etag=etag) as servidor:
+                url = catalogo_html.url_pagina(servidor.url("bench"), 1)
+                t_descarga, datos = medir(cache.obtener, sesion, url, repeticiones=1)
+                assert datos["products"] == productos and servidor.peticiones == 1
+
+                t_acierto, datos = medir(cache.obtener, sesion, url, repeticiones=repeticiones)
+                assert datos["products"] == productos
+                assert servidor.peticiones == 1, "dentro del TTL no debe consultarse al servidor"
+
+                cache.ttl = 0
+                t_304, datos = medir(cache.obtener, sesion, url, repeticiones=repeticiones)
+                assert datos["products"] == productos
+                assert servidor.no_modificadas == servidor.peticiones - 1 == repeticiones, \
+                    "cada revalidación debe responderse con 304"
+
+                servidor.cambiar("bench", productos[1:])
+                t_cambio, datos = medir(cache.obtener, sesion, url, repeticiones=1)
+                assert datos["products"] == productos[1:], "un cambio en la colección debe descargarse"
+                assert servidor.no_modificadas == repeticiones
+            # Servidor apagado: se usa la última copia guardada
+            t_sin_red, datos = medir(_silencioso, cache.obtener, sesion, url, repeticiones=1)
+            assert datos["products"] == productos[1:]
+        validador = "ETag" if etag else "Last-Modified"
+        print(f"{validador:>13} " + " ".join(f"{t * 1000:>7.2f} ms" for t in
+                                             (t_descarga, t_acierto, t_304, t_cambio, t_sin_red)))
+
+# Historial de resultados de "pipeline" (una línea JSON por medición)
+HISTORIAL = "bench_historial.jsonl"
+
+# Una etapa es una regresión si tarda más de este factor respecto a la última
+# medición comparable del historial y al menos REGRESION_MIN_SEGUNDOS más
+REGRESION_FACTOR = 1.25
+REGRESION_MIN_SEGUNDOS = 0.005
+
+def _silencioso(funcion, *args, **kwargs):
+    """Llama a `funcion` sin mostrar lo que imprime (los resúmenes del catálogo)."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return funcion(*args, **kwargs)
+
+def _commit_actual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _ultima_comparable(ruta, parametros):
+    """Última entrada del historial con los mismos parámetros y máquina, o None."""
+    ultima = None
+    try:
+        with open(ruta, encoding="utf-8") as f:
+            for linea in f:
+                entrada = json.loads(linea)
+                if entrada.get("parametros") == parametros and entrada.get("maquina") == platform.node():
+                    ultima = entrada
+    except (OSError, ValueError):
+        pass
+    return ultima
+
+def _medir_etapas(url, ruta_excel, salida):
+    """Tiempo de cada etapa por separado (mejor de 3) sobre los mismos datos."""
+    productos = _silencioso(lambda: list(catalogo_html.extraer_productos([url])))
+    datos = catalogo_html.leer_excel(ruta_excel, usar_cache=False)
+    titulos = [p["nombre"] for p in productos]
+
+    def normalizar():
+        catalogo_html._normalizar.cache_clear()
+        return [catalogo_html.normalize_text(t) for t in titulos]
+
+    def emparejar():
+        indice = catalogo_html.IndiceNombres(datos)
+        return [indice.buscar(catalogo_html.normalize_text(t)) for t in titulos]
+
+    etapas = {
+        "extraer_productos": lambda: _silencioso(lambda: list(catalogo_html.extraer_productos([url]))),
+        "leer_excel": lambda: catalogo_html.leer_excel(ruta_excel, usar_cache=False),
+        "normalize_text": normalizar,
+        "coincidencias": emparejar,
+        "generar_html": lambda: _silencioso(catalogo_html.generar_html, productos, datos,
+                                            archivo=salida, incremental=False),
+    }
+    return {nombre: round(medir(funcion)[0], 4) for nombre, funcion in etapas.items()}
+
+def _medir_completo(url, ruta_excel, salida):
+    """Una generación completa (descarga, Excel, coincidencias y HTML) con sus métricas."""
+    metricas = catalogo_html.METRICAS
+    metricas.reiniciar()
+    inicio = time.perf_counter()
+    productos = metricas.medir_generador("descarga", catalogo_html.extraer_productos([url]))
+    with metricas.medir("excel"):
+        datos = catalogo_html.leer_excel(ruta_excel, usar_cache=False)
+    _silencioso(catalogo_html.construir, productos, datos, catalogo_html.Tienda(archivo=salida))
+    total = time.perf_counter() - inicio
+    return round(total, 4), {nombre: e["segundos"] for nombre, e in metricas.informe()["etapas"].items()}
+
+def bench_pipeline(tamanos=(1_000, 10_000), acentos=0.3, duplicados=0.05, historial=HISTORIAL):
+    """
+    Catálogo completo con datos sintéticos servidos desde un servidor local:
+    cada etapa por separado y una generación completa (sin imágenes locales,
+    que necesitarían un CDN). Añade los resultados a `historial` y compara con
+    la última medición equivalente; devuelve cuántas regresiones encontró.
+    """
+    ruta_historial = os.path.join(os.path.dirname(os.path.abspath(__file__)), historial)
+    imagenes_locales = catalogo_html.IMAGENES_LOCALES
+    catalogo_html.IMAGENES_LOCALES = False
+    regresiones = 0
+    try:
+        for cantidad in tamanos:
+            parametros = {"productos": cantidad, "acentos": acentos, "duplicados": duplicados}
+            with tempfile.TemporaryDirectory() as carpeta, \
+                    ServidorShopify({"bench": catalogo_sintetico(cantidad, acentos, duplicados)}) as servidor:
+                ruta_excel = os.path.join(carpeta, "productos.xlsx")
+                excel_sintetico(servidor.colecciones["bench"], ruta_excel)
+                salida = os.path.join(carpeta, "catalogo.html")
+                etapas = _medir_etapas(servidor.url("bench"), ruta_excel, salida)
+                total, completo = _medir_completo(servidor.url("bench"), ruta_excel, salida)
+                tamano_salida = os.path.getsize(salida)
+
+            entrada = {
+                "fecha": datetime.datetime.now().isoformat(timespec="seconds"),
+                "commit": _commit_actual(),
+                "maquina": platform.node(),
+                "python": platform.python_version(),
+                "parametros": parametros,
+                "etapas": etapas,
+                "completo": {"segundos": total, "etapas": completo},
+                "bytes_salida": tamano_salida,
+            }
+            anterior = _ultima_comparable(ruta_historial, parametros)
+            with open(ruta_historial, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entrada, ensure_ascii=False) + "\n")
+
+            print(f"-- {cantidad} productos (acentos {acentos:.0%}, duplicados {duplicados:.0%}) --")
+            print(f"{'etapa':>18} {'segundos':>10} {'anterior':>10}")
+            filas = list(etapas.items()) + [("completo", total)]
+            previas = dict(anterior["etapas"], completo=anterior["completo"]["segundos"]) if anterior else {}
+            for nombre, segundos in filas:
+                previo = previas.get(nombre)
+                marca = ""
+                if previo is not None and segundos > previo * REGRESION_FACTOR and segundos - previo > REGRESION_MIN_SEGUNDOS:
+                    marca = "  REGRESIÓN"
+                    regresiones += 1
+                texto_previo = f"{previo:>10.4f}" if previo is not None else f"{'-':>10}"
+                print(f"{nombre:>18} {segundos:>10.4f} {texto_previo}{marca}")
+            print("   completo por etapa: " + ", ".join(f"{n} {s:.3f} s" for n, s in completo.items()))
+    finally:
+        catalogo_html.IMAGENES_LOCALES = imagenes_locales
+    print(f"Resultados añadidos a {ruta_historial}")
+    return regresiones
+
+BENCHMARKS = {
+    "excel": bench_excel,
+    "normalize": bench_normalize,
+    "tarjetas": bench_tarjetas,
+    "arranque": bench_arranque,
+    "cache_http": bench_cache_http,
+    "pipeline": bench_pipeline,
+}
+
+if __name__ == "__main__":
+    nombres = sys.argv[1:] or list(BENCHMARKS)
+    regresiones = 0
+    for nombre in nombres:
+        print(f"== {nombre} ==")
+        regresiones += BENCHMARKS[nombre]() or 0
+    sys.exit(1 if regresiones else 0)
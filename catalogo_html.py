@@ -3,11 +3,28 @@
 # Genera catalogo.html a partir del JSON de productos y un Excel (productos.xlsx).
 # Incluye configuración para redes sociales y WhatsApp, y carrito compacto en móvil.
 
+import argparse
+import contextlib
 import os
-import requests
-import pandas as pd
+import queue
+import stat
+import sys
+import tempfile
+import threading
+import time
+import functools
+import gzip
+import itertools
 import html
+import hashlib
+import io
+import json
+import keyword
+import re
 import unicodedata
+from collections import deque, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
 
 # -------------------------
 # CONFIGURACIÓN (edita aquí)
@@ -26,15 +43,132 @@ WHATSAPP_NUMBER = "50670107098"  # <-- AQUI: reemplaza con tu número de WhatsAp
 # URL JSON de productos (puedes cambiar si tienes otra fuente)
 URL = "https://www.maxsport.com.co/collections/zapatillas-max/products.json"
 
+# Colecciones de las que se toman productos (se descargan en paralelo y se quitan duplicados)
+URLS = [URL]
+
+# Paginación del JSON de productos (Shopify admite como máximo 250 por página)
+PRODUCTOS_POR_PAGINA = 250
+
+# Páginas que se descargan a la vez como máximo (también es el tamaño del pool de conexiones)
+PAGINAS_EN_VUELO = 4
+
+# Reintentos por página ante errores de red o respuestas 429/5xx (con espera exponencial)
+REINTENTOS = 3
+
 # Nombre de la tienda que aparecerá en el header
 STORE_NAME = "Regate FutStore"  # <-- Cambia si quieres otro nombre
 
 # Nombre del archivo Excel (colócalo en la misma carpeta)
 EXCEL_FILENAME = "productos.xlsx"
 
+# Caché del Excel ya normalizado (archivos ".<excel>.cache.*" junto al Excel).
+# El .xlsx solo se vuelve a leer cuando cambia; se guarda en Parquet si hay pyarrow
+# y con pickle en caso contrario.
+CACHE_EXCEL = True
+
+# Los Excel de hasta este tamaño se leen con un lector propio (zipfile + XML), sin
+# cargar pandas, cuya importación cuesta casi medio segundo. Con 0 siempre se usa pandas.
+EXCEL_LIGERO_MAX_BYTES = 256 * 1024
+
 # Nombre del archivo HTML de salida
 OUTPUT_HTML = "catalogo.html"
 
+# Caché HTTP del JSON de productos (carpeta junto a OUTPUT_HTML).
+# Durante CACHE_HTTP_TTL segundos se reutiliza sin consultar al servidor; después se
+# revalida con If-None-Match / If-Modified-Since. Si no hay red se usa la copia guardada.
+CACHE_HTTP_DIR = ".cache_http"
+CACHE_HTTP_TTL = 300
+CACHE_HTTP_MAX_BYTES = 50 * 1024 * 1024
+
+# Manifiesto de la última generación, uno por HTML de salida (".<salida>.manifest.json"
+# en su carpeta): hashes de entradas y salida y fragmentos HTML de cada tarjeta, para no
+# regenerar ni reescribir lo que no cambió. Las tarjetas ocupan en él más o menos lo
+# mismo que en el HTML.
+MANIFIESTO = ".manifest.json"
+
+# Similitud mínima (0 a 1, trigramas) para emparejar un título del proveedor con un
+# nombre del Excel que no coincide exactamente. Con 1.0 solo valen coincidencias exactas.
+UMBRAL_SIMILITUD = 0.88
+
+# Las coincidencias aproximadas (por debajo de 1.0) solo se anotan en el reporte, para
+# revisarlas y corregir el Excel. Con True también se publican, pero una a una: solo
+# contra filas que ningún producto exacto ni otra aproximada ya usa (por eso sus
+# tarjetas van al final del catálogo, cuando ya se sabe qué filas quedaron libres).
+PUBLICAR_APROXIMADAS = False
+
+# Nombres normalizados que se recuerdan entre llamadas a normalize_text
+CACHE_NORMALIZE = 65536
+
+# Reporte de coincidencias, uno por HTML de salida ("<salida>.coincidencias.json" en su
+# carpeta): emparejamientos aproximados con su puntuación y entradas sin pareja de ambos lados.
+REPORTE_COINCIDENCIAS = ".coincidencias.json"
+
+# Carpeta (junto a OUTPUT_HTML) del JS del catálogo, publicado con un hash de su
+# contenido en el nombre para que el navegador pueda cachearlo indefinidamente
+ASSETS_DIR = "assets"
+
+# Copia local de las imágenes (carpeta IMAGENES_DIR junto a OUTPUT_HTML) con variantes
+# WebP de varios anchos para srcset. Solo se descargan las 3 primeras imágenes de los
+# productos que aparecen en el Excel y nunca se vuelve a pedir una URL ya procesada.
+# Desactivada por defecto (se activa aquí o con --imagenes-locales) porque descarga
+# y recodifica todas las imágenes. Requiere Pillow; sin él se enlazan las originales.
+IMAGENES_LOCALES = False
+IMAGENES_DIR = "img"
+ANCHOS_IMAGEN = (320, 640, 960)
+HILOS_IMAGENES = 8
+
+# Productos por parte del catálogo. Con 0 todo va en un único HTML. Con N > 0 el HTML
+# lleva los N primeros y el resto se reparte en archivos "<salida>-parte-0001.html", ...
+# que la página pide al hacer scroll, guiándose por INDICE_PARTES (requiere servir
+# el catálogo por HTTP, no abrirlo como archivo local).
+PRODUCTOS_POR_PARTE = 0
+INDICE_PARTES = "catalog-index.json"
+
+# Escribe el HTML a medida que llegan los productos, con memoria constante (para
+# catálogos enormes). Desactiva la reutilización de tarjetas del manifiesto.
+STREAMING_HTML = False
+
+# Modo --watch: cada cuánto se mira si cambió el Excel (segundos), cuánto tiempo debe
+# quedar quieto antes de regenerar (al guardar, Excel escribe el archivo en varios
+# pasos) y cada cuánto se consulta la fuente de productos con peticiones condicionales.
+VIGILAR_INTERVALO_EXCEL = 0.25
+VIGILAR_ESPERA = 0.2
+VIGILAR_INTERVALO_FUENTE = 300
+
+# Métricas de cada generación (tiempo y memoria pico por etapa, bytes descargados,
+# filas del Excel, coincidencias y tamaño de la salida) en METRICAS_JSON, junto a
+# OUTPUT_HTML. Solo se guardan cuando la generación escribió el catálogo: una
+# ejecución sin cambios o fallida no toca el disco (su resumen solo se imprime).
+# Si METRICAS_PROMETHEUS tiene una ruta, se escriben ahí en cada ejecución, en el
+# formato del "textfile collector" de node_exporter para graficarlas.
+METRICAS_JSON = "metricas_catalogo.json"
+METRICAS_PROMETHEUS = ""
+
+# Modo --tiendas (varias tiendas desde un archivo .toml, .json o .yaml): resumen de la
+# generación, junto al archivo de configuración, y procesos que renderizan tiendas a la
+# vez (0 = uno por CPU). Ver tiendas.ejemplo.toml.
+RESUMEN_TIENDAS = "resumen_tiendas.json"
+PROCESOS_TIENDAS = 0
+
+class Tienda:
+    """
+    Configuración de una tienda: nombre, WhatsApp, redes sociales, fuentes de
+    productos, Excel y HTML de salida. Lo que no se indique se toma de las
+    constantes del principio del archivo (así, Tienda() es la tienda de siempre).
+    """
+
+    def __init__(self, nombre=None, whatsapp=None, redes=None, urls=None, excel=None, archivo=None):
+        base = os.path.dirname(os.path.abspath(__file__))
+        self.nombre = STORE_NAME if nombre is None else nombre
+        self.whatsapp = WHATSAPP_NUMBER if whatsapp is None else str(whatsapp)
+        self.redes = dict(SOCIAL_LINKS if redes is None else redes)
+        self.urls = list(URLS if urls is None else urls)
+        self.excel = os.path.join(base, EXCEL_FILENAME if excel is None else excel)
+        self.archivo = os.path.join(base, OUTPUT_HTML if archivo is None else archivo)
+
+    def __repr__(self):
+        return f"Tienda({self.nombre!r}, archivo={self.archivo!r})"
+
 # -------------------------
 # Funciones auxiliares
 # -------------------------
@@ -43,41 +177,589 @@ def normalize_text(s):
     """Normaliza texto: strip, lower, quitar acentos."""
     if not isinstance(s, str):
         s = str(s)
+    return _normalizar(s)
+
+@functools.lru_cache(maxsize=CACHE_NORMALIZE)
+def _normalizar(s):
+    """normalize_text con memoria; los textos ASCII no pasan por NFKD."""
     s = s.strip().lower()
-    s = unicodedata.normalize('NFKD', s)
-    s = ''.join(ch for ch in s if not unicodedata.combining(ch))
-    return s
+    if s.isascii():
+        return s
+    return unicodedata.normalize('NFKD', s).translate(_SIN_DIACRITICOS)
+
+class _TablaSinDiacriticos(dict):
+    """
+    Tabla para str.translate que elimina las marcas (categoría M: acentos tras
+    NFKD), igual que /\\p{M}/gu en el JS de la página.
+    Se rellena bajo demanda: cada carácter se consulta en unicodedata una sola vez.
+    """
+
+    def __missing__(self, cp):
+        valor = None if unicodedata.category(chr(cp)).startswith("M") else cp
+        self[cp] = valor
+        return valor
+
+_SIN_DIACRITICOS = _TablaSinDiacriticos()
+
+def ruta_junto_a_salida(nombre, archivo=OUTPUT_HTML):
+    """Ruta absoluta de `nombre` en la misma carpeta que el HTML de salida."""
+    ruta_actual = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(os.path.dirname(os.path.join(ruta_actual, archivo)), nombre)
+
+def ruta_propia_de_salida(sufijo, archivo=OUTPUT_HTML, oculto=False):
+    """Como ruta_junto_a_salida, pero con el nombre del HTML delante ("catalogo" + `sufijo`)."""
+    base = os.path.splitext(os.path.basename(archivo))[0]
+    return ruta_junto_a_salida(("." if oculto else "") + base + sufijo, archivo)
 
-def extraer_productos(url):
-    """Descarga JSON de productos y extrae título e imágenes (máx 3)."""
+def _rss_pico_mb():
+    """Memoria residente máxima del proceso hasta ahora (MB), o None si no se puede saber."""
     try:
-        resp = requests.get(url, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
+        import resource
+    except ImportError:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux la da en KB y macOS en bytes
+    return round(pico / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+class Metricas:
+    """
+    Métricas de una generación del catálogo, por etapa: segundos, memoria pico
+    del proceso al terminar la etapa y contadores (bytes, filas, productos...).
+    Las etapas anidadas no se solapan: mientras se consume un generador medido
+    dentro de otra etapa, el tiempo cuenta solo para el generador, así que la
+    suma de las etapas es el tiempo total. Se puede sumar desde varios hilos.
+    """
+
+    def __init__(self):
+        self._cerrojo = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        self.inicio = time.time()
+        self.etapas = {}
+        self._pila = []
+
+    def _etapa(self, nombre):
+        return self.etapas.setdefault(nombre, {"segundos": 0.0})
+
+    def sumar(self, etapa, clave, valor=1):
+        with self._cerrojo:
+            datos = self._etapa(etapa)
+            datos[clave] = datos.get(clave, 0) + valor
+
+    def fijar(self, etapa, **valores):
+        with self._cerrojo:
+            self._etapa(etapa).update(valores)
+
+    def _entrar(self, etapa):
+        ahora = time.perf_counter()
+        if self._pila:
+            anterior = self._pila[-1]
+            self.sumar(anterior[0], "segundos", ahora - anterior[1])
+        self._pila.append([etapa, ahora])
+
+    def _salir(self):
+        ahora = time.perf_counter()
+        etapa, desde = self._pila.pop()
+        self.sumar(etapa, "segundos", ahora - desde)
+        if self._pila:
+            self._pila[-1][1] = ahora
+
+    @contextlib.contextmanager
+    def medir(self, etapa):
+        """Cuenta para `etapa` el tiempo del bloque `with`."""
+        self._entrar(etapa)
+        try:
+            yield
+        finally:
+            self._salir()
+            self.fijar(etapa, rss_pico_mb=_rss_pico_mb())
+
+    def medir_generador(self, etapa, iterable):
+        """Entrega lo mismo que `iterable`, contando para `etapa` el tiempo pasado dentro de él."""
+        it = iter(iterable)
+        try:
+            while True:
+                self._entrar(etapa)
+                try:
+                    elemento = next(it)
+                except StopIteration:
+                    return
+                finally:
+                    self._salir()
+                yield elemento
+        finally:
+            self.fijar(etapa, rss_pico_mb=_rss_pico_mb())
+
+    def aparte(self, etapa, segundos):
+        """Pasa a `etapa` `segundos` ya transcurridos de la etapa en curso (p. ej. un cálculo interno)."""
+        if self._pila:
+            self.sumar(self._pila[-1][0], "segundos", -segundos)
+        self.sumar(etapa, "segundos", segundos)
+
+    def informe(self):
+        """Diccionario con todas las métricas, listo para JSON."""
+        with self._cerrojo:
+            etapas = {nombre: dict(datos) for nombre, datos in self.etapas.items()}
+        for datos in etapas.values():
+            datos["segundos"] = round(datos["segundos"], 4)
+        return {
+            "inicio": self.inicio,
+            "segundos": round(sum(d["segundos"] for d in etapas.values()), 4),
+            "rss_pico_mb": _rss_pico_mb(),
+            "etapas": etapas,
+        }
+
+    def prometheus(self, informe=None):
+        """Las métricas en el formato de texto de Prometheus (una serie por etapa y contador)."""
+        informe = informe or self.informe()
+        lineas = [
+            "# HELP catalogo_generacion_timestamp_seconds Inicio de la última generación del catálogo.",
+            "# TYPE catalogo_generacion_timestamp_seconds gauge",
+            f"catalogo_generacion_timestamp_seconds {informe['inicio']:.3f}",
+            "# HELP catalogo_generacion_segundos Duración total de la última generación.",
+            "# TYPE catalogo_generacion_segundos gauge",
+            f"catalogo_generacion_segundos {informe['segundos']}",
+        ]
+        if informe["rss_pico_mb"] is not None:
+            lineas += [
+                "# HELP catalogo_rss_pico_mb Memoria residente máxima del proceso (MB).",
+                "# TYPE catalogo_rss_pico_mb gauge",
+                f"catalogo_rss_pico_mb {informe['rss_pico_mb']}",
+            ]
+        series = defaultdict(list)
+        for etapa, datos in sorted(informe["etapas"].items()):
+            for clave, valor in sorted(datos.items()):
+                if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+                    series[clave].append(f'catalogo_etapa_{clave}{{etapa="{etapa}"}} {valor}')
+        for clave, muestras in sorted(series.items()):
+            lineas += [f"# TYPE catalogo_etapa_{clave} gauge"] + muestras
+        return "\n".join(lineas) + "\n"
+
+    def resumen(self, informe=None):
+        """Una línea con el tiempo de cada etapa, el total y la memoria pico."""
+        informe = informe or self.informe()
+        etapas = ", ".join(f"{nombre} {datos['segundos']:.2f} s" for nombre, datos in informe["etapas"].items())
+        memoria = f", memoria pico {informe['rss_pico_mb']} MB" if informe["rss_pico_mb"] is not None else ""
+        return f"Etapas: {etapas}; total {informe['segundos']:.2f} s{memoria}"
+
+# Métricas de la generación en curso (se reinician al empezar cada una)
+METRICAS = Metricas()
+
+class CacheHTTP:
+    """
+    Caché en disco de respuestas JSON con peticiones condicionales.
+    Guarda el cuerpo junto a sus cabeceras ETag y Last-Modified (un archivo por URL).
+    La fecha de modificación del archivo marca la última validación: sirve para
+    el TTL y para desalojar primero las entradas más antiguas cuando la carpeta
+    supera `max_bytes`. El tamaño ocupado se lleva en memoria (la carpeta solo se
+    recorre en la primera escritura y al recortar).
+    """
+
+    def __init__(self, directorio, ttl=CACHE_HTTP_TTL, max_bytes=CACHE_HTTP_MAX_BYTES):
+        self.directorio = directorio
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._ocupado = None
+        self._cerrojo = threading.Lock()
+        os.makedirs(directorio, exist_ok=True)
+
+    def _ruta(self, url):
+        return os.path.join(self.directorio, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".json")
+
+    def _leer(self, url):
+        ruta = self._ruta(url)
+        try:
+            with open(ruta, encoding="utf-8") as f:
+                entrada = json.load(f)
+            entrada["validado"] = os.path.getmtime(ruta)
+            return entrada
+        except (OSError, ValueError):
+            return None
+
+    def _guardar(self, url, entrada):
+        ruta = self._ruta(url)
+        try:
+            anterior = os.path.getsize(ruta)
+        except OSError:
+            anterior = 0
+        temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temporal, "w", encoding="utf-8") as f:
+                json.dump(entrada, f, ensure_ascii=False)
+            os.replace(temporal, ruta)
+        finally:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+        with self._cerrojo:
+            if self._ocupado is not None:
+                self._ocupado += os.path.getsize(ruta) - anterior
+            if self._ocupado is None or self._ocupado > self.max_bytes:
+                self._recortar()
+
+    def _recortar(self):
+        """Borra las entradas validadas hace más tiempo hasta quedar bajo max_bytes (y mide lo ocupado)."""
+        entradas = []
+        total = 0
+        with os.scandir(self.directorio) as it:
+            for e in it:
+                if not e.name.endswith(".json"):
+                    continue
+                try:
+                    st = e.stat()
+                except FileNotFoundError:
+                    continue
+                entradas.append((st.st_mtime, st.st_size, e.path))
+                total += st.st_size
+        entradas.sort()
+        for _, tam, ruta in entradas:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(ruta)
+            except FileNotFoundError:
+                pass
+            total -= tam
+        self._ocupado = total
+
+    def obtener(self, sesion, url, timeout=10):
+        """Devuelve el JSON de `url`, usando la copia en caché cuando es válida."""
+        entrada = self._leer(url)
+        if entrada is not None and time.time() - entrada["validado"] < self.ttl:
+            return json.loads(entrada["cuerpo"])
+        cabeceras = {}
+        if entrada is not None:
+            if entrada.get("etag"):
+                cabeceras["If-None-Match"] = entrada["etag"]
+            if entrada.get("last_modified"):
+                cabeceras["If-Modified-Since"] = entrada["last_modified"]
+        try:
+            resp = sesion.get(url, headers=cabeceras, timeout=timeout)
+            if resp.status_code == 304 and entrada is not None:
+                # Sin cambios: solo se renueva la fecha de validación
+                METRICAS.sumar("descarga", "no_modificadas")
+                os.utime(self._ruta(url))
+                return json.loads(entrada["cuerpo"])
+            resp.raise_for_status()
+            METRICAS.sumar("descarga", "bytes", len(resp.content))
+            datos = resp.json()
+        except Exception as e:
+            if entrada is None:
+                raise
+            print(f"No se pudo validar {url} ({e}); se usa la copia en caché")
+            return json.loads(entrada["cuerpo"])
+        try:
+            self._guardar(url, {
+                "url": url,
+                "etag": resp.headers.get("ETag"),
+                "last_modified": resp.headers.get("Last-Modified"),
+                "cuerpo": resp.text,
+            })
+        except OSError as e:
+            # La descarga fue bien: sin caché solo se pierde la próxima revalidación
+            print(f"No se pudo guardar {url} en la caché HTTP:", e)
+        return datos
+
+def crear_sesion(max_conexiones=PAGINAS_EN_VUELO):
+    """Crea una sesión HTTP con pool de conexiones y reintentos con backoff."""
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    reintentos = Retry(
+        total=REINTENTOS,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET"]),
+        raise_on_status=False,
+    )
+    adaptador = HTTPAdapter(pool_connections=max_conexiones, pool_maxsize=max_conexiones, max_retries=reintentos)
+    sesion = requests.Session()
+    sesion.mount("https://", adaptador)
+    sesion.mount("http://", adaptador)
+    return sesion
+
+class _SesionPerezosa:
+    """
+    Sesión HTTP que se crea (e importa requests) en la primera petición: si todo
+    sale de la caché HTTP o de disco, no se paga la importación.
+    """
+
+    def __init__(self, max_conexiones=PAGINAS_EN_VUELO):
+        self.max_conexiones = max_conexiones
+        self._sesion = None
+        self._cerrojo = threading.Lock()
+
+    def get(self, *args, **kwargs):
+        with self._cerrojo:
+            if self._sesion is None:
+                self._sesion = crear_sesion(self.max_conexiones)
+        return self._sesion.get(*args, **kwargs)
+
+    def close(self):
+        if self._sesion is not None:
+            self._sesion.close()
+
+def url_pagina(url, pagina, limite=PRODUCTOS_POR_PAGINA):
+    """Añade page y limit a la URL conservando el resto de parámetros."""
+    partes = urlsplit(url)
+    query = dict(parse_qsl(partes.query))
+    query.update(page=str(pagina), limit=str(limite))
+    return urlunsplit(partes._replace(query=urlencode(query)))
+
+def descargar_pagina(sesion, url, pagina, cache=None, limite=PRODUCTOS_POR_PAGINA):
+    """Descarga una página del JSON de productos y devuelve su lista "products"."""
+    if cache is not None:
+        return cache.obtener(sesion, url_pagina(url, pagina, limite)).get("products", [])
+    resp = sesion.get(url_pagina(url, pagina, limite), timeout=10)
+    resp.raise_for_status()
+    METRICAS.sumar("descarga", "bytes", len(resp.content))
+    return resp.json().get("products", [])
+
+def _producto_desde_json(p):
+    """Extrae título, handle e imágenes (máx 3) de un producto del JSON."""
+    nombre = p.get("title", "").strip()
+    imagenes = [img.get("src") for img in p.get("images", [])[:3]] if p.get("images") else []
+    return {"nombre": nombre, "handle": p.get("handle", ""), "imagenes": imagenes}
+
+class FuenteIncompleta(RuntimeError):
+    """Una fuente falló (sin copia en caché) o se cortó a medias: el catálogo quedaría incompleto."""
+
+def _extraer_fuente(url, sesion=None, en_vuelo=PAGINAS_EN_VUELO, stats=None, cache=None,
+                    limite=PRODUCTOS_POR_PAGINA):
+    """
+    Recorre todas las páginas del JSON de productos de una colección
+    (?page=N&limit=250) y va entregando cada producto en cuanto llega su página.
+    Mantiene hasta `en_vuelo` páginas descargándose a la vez y termina en la
+    primera página con menos de `limite` productos. Si una página falla tras los
+    reintentos (y la caché no tiene copia), lanza FuenteIncompleta: sea la primera
+    o una posterior, publicar sin ella dejaría el catálogo incompleto.
+    """
+    if stats is None:
+        stats = {}
+    sesion_propia = sesion is None
+    if sesion_propia:
+        sesion = _SesionPerezosa(en_vuelo)
+    pool = ThreadPoolExecutor(max_workers=en_vuelo)
+    try:
+        pendientes = deque()
+        siguiente = 1
+        for _ in range(en_vuelo):
+            pendientes.append((siguiente, pool.submit(descargar_pagina, sesion, url, siguiente, cache, limite)))
+            siguiente += 1
+        # Las páginas se entregan en orden aunque terminen de descargarse desordenadas
+        while pendientes:
+            pagina, futuro = pendientes.popleft()
+            try:
+                items = futuro.result()
+            except Exception as e:
+                raise FuenteIncompleta(f"Falló la página {pagina} de {url}: {e}") from e
+            if items:
+                stats["paginas"] = stats.get("paginas", 0) + 1
+            for p in items:
+                yield _producto_desde_json(p)
+            if len(items) < limite:
+                return
+            pendientes.append((siguiente, pool.submit(descargar_pagina, sesion, url, siguiente, cache, limite)))
+            siguiente += 1
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        if sesion_propia:
+            sesion.close()
+
+def _poner(cola, elemento, parar):
+    """Pone `elemento` en la cola (limitada) esperando hueco; False si antes se pidió parar."""
+    while not parar.is_set():
+        try:
+            cola.put(elemento, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+def _volcar_fuente(url, en_vuelo, cola, parar, stats, cache):
+    """
+    Descarga una colección completa dejando sus productos en la cola. Si la
+    cola está llena espera a que el consumidor avance, y deja de descargar en
+    cuanto se activa `parar`.
+    """
+    inicio = time.perf_counter()
+    try:
+        for prod in _extraer_fuente(url, en_vuelo=en_vuelo, stats=stats, cache=cache):
+            if not _poner(cola, (url, prod), parar):
+                break
     except Exception as e:
-        print("Error descargando JSON de productos:", e)
-        return []
-    productos = []
-    for p in data.get("products", []):
-        nombre = p.get("title", "").strip()
-        imagenes = [img.get("src") for img in p.get("images", [])[:3]] if p.get("images") else []
-        productos.append({"nombre": nombre, "imagenes": imagenes})
-    return productos
+        stats["fallos"] = stats.get("fallos", 0) + 1
+        print(f"Error descargando JSON de productos ({url}):", e)
+        if not isinstance(e, FuenteIncompleta):
+            e = FuenteIncompleta(f"Falló la descarga de {url}: {e}")
+        _poner(cola, (url, e), parar)
+    finally:
+        stats["segundos"] = time.perf_counter() - inicio
+        _poner(cola, (url, None), parar)
+
+def _nuevo_producto(prod, vistos_handle, vistos_nombre):
+    """True si `prod` no se vio antes (por handle ni por título normalizado); lo anota como visto."""
+    handle = prod.get("handle")
+    nombre_norm = normalize_text(prod.get("nombre", ""))
+    if (handle and handle in vistos_handle) or nombre_norm in vistos_nombre:
+        return False
+    if handle:
+        vistos_handle.add(handle)
+    vistos_nombre.add(nombre_norm)
+    return True
 
-def leer_excel(ruta_excel):
+def extraer_productos(urls, en_vuelo=PAGINAS_EN_VUELO, estadisticas=None, cache=None):
     """
-    Lee un Excel con columnas que contengan (insensible a mayúsculas):
-    nombre / nombre_producto / Name / producto
-    precio / Precio / price
-    tallas / Tallas / sizes
-    Devuelve un diccionario normalizado: {nombre_normalizado: (precio, tallas)}
+    Descarga en paralelo una o varias colecciones (una URL o una lista) y va
+    entregando sus productos a medida que llegan (es un generador).
+    Quita duplicados entre fuentes por handle o por título normalizado.
+    Si se pasa `estadisticas` (dict), se rellena por URL con productos,
+    duplicados, páginas, fallos y segundos; el resumen también se imprime.
+    Con `cache` (CacheHTTP) las páginas se revalidan con peticiones condicionales.
+    Si una fuente falla sin copia en caché, o se corta a medias, lanza
+    FuenteIncompleta (un RuntimeError) para no publicar un catálogo incompleto.
     """
-    if not os.path.exists(ruta_excel):
-        print(f"No se encontró el archivo Excel: {ruta_excel}")
-        return {}
-    df = pd.read_excel(ruta_excel, dtype=str)
-    df = df.fillna("")
-    cols = {c.lower(): c for c in df.columns}
+    if isinstance(urls, str):
+        urls = [urls]
+    urls = list(dict.fromkeys(urls))
+    if estadisticas is None:
+        estadisticas = {}
+    for url in urls:
+        estadisticas[url] = {"productos": 0, "duplicados": 0, "paginas": 0, "fallos": 0, "segundos": 0.0}
+    METRICAS.sumar("descarga", "bytes", 0)
+    if not urls:
+        return
+
+    # Como mucho una página por fuente esperando al consumidor
+    cola = queue.Queue(maxsize=PRODUCTOS_POR_PAGINA * len(urls))
+    parar = threading.Event()
+    pool = ThreadPoolExecutor(max_workers=len(urls))
+    vistos_handle = set()
+    vistos_nombre = set()
+    activas = len(urls)
+    try:
+        for url in urls:
+            pool.submit(_volcar_fuente, url, en_vuelo, cola, parar, estadisticas[url], cache)
+        while activas:
+            url, prod = cola.get()
+            if prod is None:
+                activas -= 1
+                continue
+            if isinstance(prod, FuenteIncompleta):
+                raise prod
+            if not _nuevo_producto(prod, vistos_handle, vistos_nombre):
+                estadisticas[url]["duplicados"] += 1
+                continue
+            estadisticas[url]["productos"] += 1
+            yield prod
+    finally:
+        parar.set()
+        pool.shutdown(wait=True, cancel_futures=True)
+        for url in urls:
+            st = estadisticas[url]
+            for clave in ("productos", "duplicados", "paginas", "fallos"):
+                METRICAS.sumar("descarga", clave, st[clave])
+            print(f"Fuente {url}: {st['productos']} productos, {st['duplicados']} duplicados, "
+                  f"{st['paginas']} páginas, {st['fallos']} fallos, {st['segundos']:.2f}s")
+
+def _variantes_imagen(sesion, url, carpeta, anchos):
+    """
+    Devuelve [(archivo, ancho), ...] con las variantes WebP de una imagen,
+    descargándola y redimensionándola solo si aún no están en `carpeta`.
+    Los archivos se nombran con el hash de la URL (caché direccionada por contenido).
+    """
+    from PIL import Image
+
+    base = hashlib.sha1(url.encode("utf-8")).hexdigest()[:20]
+    ruta_meta = os.path.join(carpeta, base + ".json")
+    try:
+        with open(ruta_meta, encoding="utf-8") as f:
+            variantes = [tuple(v) for v in json.load(f)]
+        if all(os.path.exists(os.path.join(carpeta, archivo)) for archivo, _ in variantes):
+            return variantes
+    except (OSError, ValueError):
+        pass
+
+    resp = sesion.get(url, timeout=20)
+    resp.raise_for_status()
+    METRICAS.sumar("imagenes", "bytes", len(resp.content))
+    METRICAS.sumar("imagenes", "descargadas")
+    with Image.open(io.BytesIO(resp.content)) as original:
+        # En JPEG decodifica directamente a menor escala si sobra resolución
+        original.draft("RGB", (max(anchos), 1))
+        original.load()
+        imagen = original.convert("RGBA" if "A" in original.getbands() else "RGB")
+    # Solo anchos que no agranden la imagen (al menos uno, el original si es pequeña)
+    utiles = [a for a in sorted(anchos) if a <= imagen.width] or [imagen.width]
+    variantes = []
+    for ancho in utiles:
+        alto = max(1, round(imagen.height * ancho / imagen.width))
+        archivo = f"{base}-{ancho}.webp"
+        ruta = os.path.join(carpeta, archivo)
+        temporal = f"{ruta}.{threading.get_ident()}.tmp"
+        try:
+            imagen.resize((ancho, alto), Image.LANCZOS).save(temporal, "WEBP", quality=80, method=4)
+            os.replace(temporal, ruta)
+        finally:
+            # Si la codificación falló, no dejar el temporal a medias
+            if os.path.exists(temporal):
+                os.remove(temporal)
+        variantes.append((archivo, ancho))
+    _escribir_atomico(ruta_meta, [json.dumps(variantes)])
+    return variantes
+
+def espejar_imagenes(productos, carpeta, aceptar=None, anchos=ANCHOS_IMAGEN, hilos=HILOS_IMAGENES):
+    """
+    Etapa posterior a extraer_productos: para cada producto (los que pasen
+    `aceptar`, si se indica) descarga sus imágenes en un pool de `hilos` y
+    añade "variantes": por cada imagen, la lista [(ruta_relativa, ancho), ...]
+    o None si no se pudo procesar (entonces se enlaza la original).
+    Los productos se entregan en el mismo orden en que llegan.
+    """
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        print("Pillow no está instalado: se enlazan las imágenes originales.")
+        yield from productos
+        return
+
+    os.makedirs(carpeta, exist_ok=True)
+    prefijo = os.path.basename(os.path.normpath(carpeta))
+    sesion = _SesionPerezosa(hilos)
+    pool = ThreadPoolExecutor(max_workers=hilos)
+
+    def procesar(url):
+        try:
+            return [(f"{prefijo}/{archivo}", ancho) for archivo, ancho in _variantes_imagen(sesion, url, carpeta, anchos)]
+        except Exception as e:
+            print(f"No se pudo procesar la imagen {url}:", e)
+            return None
+
+    try:
+        pendientes = deque()
+        for prod in productos:
+            if aceptar is None or aceptar(prod):
+                futuros = [pool.submit(procesar, url) for url in prod.get("imagenes", [])]
+            else:
+                futuros = None
+            pendientes.append((prod, futuros))
+            # Se adelantan unos cuantos productos para mantener ocupado el pool
+            while len(pendientes) > hilos * 2:
+                yield _con_variantes(*pendientes.popleft())
+        while pendientes:
+            yield _con_variantes(*pendientes.popleft())
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        sesion.close()
+
+def _con_variantes(prod, futuros):
+    if futuros is None:
+        return prod
+    return dict(prod, variantes=[f.result() for f in futuros])
+
+def _detectar_columnas(columnas):
+    """Devuelve (col_nombre, col_precio, col_tallas) según los encabezados del Excel."""
+    cols = {c.lower(): c for c in columnas}
     col_nombre = None
     for key in ["nombre", "nombre_producto", "name", "producto", "producto_nombre"]:
         if key in cols:
@@ -93,43 +775,679 @@ def leer_excel(ruta_excel):
         if key in cols:
             col_tallas = cols[key]
             break
+    return col_nombre, col_precio, col_tallas
+
+def _columna_o_defecto(df, col, filas, defecto):
+    """Valores (sin espacios) de `col` en las filas indicadas; los vacíos pasan a `defecto`."""
+    import pandas as pd
+    if col is None:
+        return pd.Series(defecto, index=df.index[filas], dtype=object)
+    valores = df.loc[filas, col].astype(object).str.strip()
+    return valores.where(valores != "", defecto)
+
+def _normalizar_tabla(df, col_nombre, col_precio, col_tallas):
+    """
+    Tabla normalizada del Excel (columnas clave, precio, tallas) calculada con
+    operaciones de columna de pandas; equivale a normalize_text fila a fila.
+    """
+    import pandas as pd
+    nombres = df[col_nombre].astype(object).str.strip()
+    filas = (nombres != "").to_numpy()
+    claves = nombres[filas].str.lower().str.normalize("NFKD").str.translate(_SIN_DIACRITICOS)
+    return pd.DataFrame({
+        "clave": claves.tolist(),
+        "precio": _columna_o_defecto(df, col_precio, filas, "N/D").tolist(),
+        "tallas": _columna_o_defecto(df, col_tallas, filas, "Consultar").tolist(),
+    }, dtype=object)
+
+def _datos_desde_tabla(tabla):
+    """{clave: (precio, tallas)}; si un nombre se repite, gana la última fila."""
+    return dict(zip(tabla["clave"].tolist(), zip(tabla["precio"].tolist(), tabla["tallas"].tolist())))
+
+def _tabla_a_datos(df, col_nombre, col_precio, col_tallas):
+    """Convierte la tabla del Excel en {nombre_normalizado: (precio, tallas)}."""
+    return _datos_desde_tabla(_normalizar_tabla(df, col_nombre, col_precio, col_tallas))
+
+def _sha256_archivo(ruta):
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+def _rutas_cache_excel(ruta_excel):
+    """Rutas (metadatos, datos sin extensión) de la caché de un Excel."""
+    carpeta, nombre = os.path.split(os.path.abspath(ruta_excel))
+    base = os.path.join(carpeta, f".{nombre}.cache")
+    return base + ".json", base
+
+def _leer_cache_excel(ruta_excel):
+    """
+    Devuelve la tabla normalizada guardada si sigue siendo válida para el Excel.
+    Si coinciden fecha y tamaño se usa sin más; si solo cambió la fecha, se
+    compara el hash del contenido antes de descartarla.
+    """
+    ruta_meta, _ = _rutas_cache_excel(ruta_excel)
+    meta = _leer_manifiesto(ruta_meta)
+    if not meta or meta.get("version") != _version_generador():
+        return None
+    st = os.stat(ruta_excel)
+    if meta.get("tamano") != st.st_size:
+        return None
+    if meta.get("mtime_ns") != st.st_mtime_ns:
+        if meta.get("sha256") != _sha256_archivo(ruta_excel):
+            return None
+        meta["mtime_ns"] = st.st_mtime_ns
+        try:
+            _escribir_atomico(ruta_meta, [json.dumps(meta)])
+        except OSError as e:
+            # La tabla sigue siendo válida; solo se repetirá el hash la próxima vez
+            print("No se pudo actualizar la caché del Excel:", e)
+    try:
+        import pandas as pd
+        ruta_datos = os.path.join(os.path.dirname(os.path.abspath(__file__)), meta["datos"])
+        if meta["formato"] == "parquet":
+            return pd.read_parquet(ruta_datos)
+        return pd.read_pickle(ruta_datos)
+    except Exception:
+        return None
+
+def _guardar_tabla(tabla, ruta, formato):
+    """Escribe la tabla en `ruta` a través de un temporal, como _escribir_atomico."""
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    try:
+        if formato == "parquet":
+            tabla.to_parquet(temporal, index=False)
+        else:
+            tabla.to_pickle(temporal)
+        os.replace(temporal, ruta)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+def _guardar_cache_excel(ruta_excel, tabla, st, sha256):
+    """
+    Guarda la tabla normalizada (Parquet si está disponible y la acepta, si no
+    pickle). La ruta de los datos se anota relativa a la carpeta del script.
+    """
+    ruta_meta, base = _rutas_cache_excel(ruta_excel)
+    try:
+        formato, ruta_datos = "parquet", base + ".parquet"
+        _guardar_tabla(tabla, ruta_datos, formato)
+    except Exception:
+        # Sin pyarrow, o columnas que Parquet no admite (p. ej. tipos mezclados)
+        formato, ruta_datos = "pickle", base + ".pkl"
+        _guardar_tabla(tabla, ruta_datos, formato)
+    _escribir_atomico(ruta_meta, [json.dumps({
+        "version": _version_generador(),
+        "mtime_ns": st.st_mtime_ns,
+        "tamano": st.st_size,
+        "sha256": sha256,
+        "formato": formato,
+        "datos": os.path.relpath(ruta_datos, os.path.dirname(os.path.abspath(__file__))),
+    })])
+
+# Namespaces de SpreadsheetML y de las relaciones del paquete .xlsx
+_NS_HOJA = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_NS_REL_DOC = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_NS_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+# Formatos numéricos integrados de Excel que son fechas u horas
+_FORMATOS_FECHA = set(range(14, 23)) | {45, 46, 47}
+
+# Textos que pandas.read_excel convierte en NaN por defecto (y luego fillna en "")
+_TEXTOS_NA = frozenset([
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND",
+    "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+])
+
+class _HojaNoSoportada(ValueError):
+    """La hoja tiene algo que el lector ligero no trata igual que pandas."""
+
+def _ruta_en_paquete(base, destino):
+    """Resuelve el Target de una relación (relativo a `base` o absoluto)."""
+    if destino.startswith("/"):
+        return destino.lstrip("/")
+    return os.path.normpath(os.path.join(base, destino)).replace(os.sep, "/")
+
+def _partes_libro(z):
+    """(ruta de la primera hoja, ruta de sharedStrings o None, ruta de styles o None)."""
+    from xml.etree import ElementTree as ET
+    libro = ET.fromstring(z.read("xl/workbook.xml"))
+    rels = {r.get("Id"): r for r in ET.fromstring(z.read("xl/_rels/workbook.xml.rels")).iter(_NS_REL + "Relationship")}
+    primera = libro.find(f"{_NS_HOJA}sheets/{_NS_HOJA}sheet")
+    hoja = _ruta_en_paquete("xl", rels[primera.get(_NS_REL_DOC + "id")].get("Target"))
+    otras = {r.get("Type").rsplit("/", 1)[-1]: _ruta_en_paquete("xl", r.get("Target")) for r in rels.values()}
+    return hoja, otras.get("sharedStrings"), otras.get("styles")
+
+def _texto_rico(nodo):
+    """Texto de un <si> o <is>: el <t> directo más los de cada <r> (sin fonética)."""
+    partes = [nodo.find(_NS_HOJA + "t")] + [r.find(_NS_HOJA + "t") for r in nodo.findall(_NS_HOJA + "r")]
+    texto = "".join(t.text or "" for t in partes if t is not None)
+    if "_x" in texto:
+        # Caracteres escapados (_x000D_ ...): que los resuelva openpyxl
+        raise _HojaNoSoportada("texto con escapes _xHHHH_")
+    return texto
+
+def _estilos_fecha(z, ruta_estilos):
+    """Índices de estilo de celda (atributo s) cuyo formato numérico es una fecha u hora."""
+    from xml.etree import ElementTree as ET
+    if ruta_estilos is None:
+        return set()
+    estilos = ET.fromstring(z.read(ruta_estilos))
+    fechas = set(_FORMATOS_FECHA)
+    for fmt in estilos.iter(_NS_HOJA + "numFmt"):
+        # Sin literales entre comillas ni [colores]: si queda d, m, y, h o s es fecha
+        codigo = re.sub(r'"[^"]*"|\[[^\]]*\]', "", fmt.get("formatCode", ""))
+        if re.search(r"[dmyhs]", codigo, re.I) and codigo.lower() != "general":
+            fechas.add(int(fmt.get("numFmtId")))
+    xfs = estilos.find(_NS_HOJA + "cellXfs")
+    if xfs is None:
+        return set()
+    return {i for i, xf in enumerate(xfs) if int(xf.get("numFmtId", 0)) in fechas}
+
+def _columna_celda(ref):
+    """Índice (desde 0) de la columna de una referencia como "C12"."""
+    n = 0
+    for ch in ref:
+        if not ch.isalpha():
+            break
+        n = n * 26 + ord(ch.upper()) - 64
+    return n - 1
+
+def _valor_celda(c, compartidas, fechas):
+    """Valor de una celda <c> como lo deja pandas.read_excel(dtype=str) tras fillna("")."""
+    tipo = c.get("t", "n")
+    v = c.find(_NS_HOJA + "v")
+    if tipo == "inlineStr":
+        nodo = c.find(_NS_HOJA + "is")
+        texto = _texto_rico(nodo) if nodo is not None else ""
+    elif v is None or v.text is None:
+        return ""
+    elif tipo == "s":
+        texto = compartidas[int(v.text)]
+    elif tipo == "str":
+        texto = v.text
+    elif tipo == "b":
+        texto = "True" if v.text == "1" else "False"
+    elif tipo == "e":
+        return ""
+    elif tipo == "n":
+        if int(c.get("s", 0)) in fechas:
+            raise _HojaNoSoportada("celda con formato de fecha")
+        # Como openpyxl + pandas: entero si no hay decimales, sin el ".0"
+        numero = float(v.text) if any(x in v.text for x in ".eE") else int(v.text)
+        if isinstance(numero, float) and numero.is_integer():
+            numero = int(numero)
+        texto = str(numero)
+    else:
+        raise _HojaNoSoportada(f"tipo de celda {tipo!r}")
+    return "" if texto in _TEXTOS_NA else texto
+
+def _filas_xlsx(z):
+    """Filas de la primera hoja como listas de textos (la primera son los encabezados)."""
+    from xml.etree import ElementTree as ET
+    ruta_hoja, ruta_compartidas, ruta_estilos = _partes_libro(z)
+    compartidas = []
+    if ruta_compartidas is not None:
+        compartidas = [_texto_rico(si) for si in ET.fromstring(z.read(ruta_compartidas)).iter(_NS_HOJA + "si")]
+    fechas = _estilos_fecha(z, ruta_estilos)
+    filas = []
+    for numero, fila in enumerate(ET.fromstring(z.read(ruta_hoja)).iter(_NS_HOJA + "row"), 1):
+        if not filas and fila.get("r", "1") != "1":
+            raise _HojaNoSoportada("la hoja no empieza en la fila 1")
+        valores = []
+        for i, c in enumerate(fila.iter(_NS_HOJA + "c")):
+            col = _columna_celda(c.get("r")) if c.get("r") else i
+            valores.extend([""] * (col - len(valores)))
+            valores.append(_valor_celda(c, compartidas, fechas))
+        filas.append(valores)
+    return filas
+
+def _leer_xlsx_ligero(ruta_excel):
+    """
+    Lee un .xlsx pequeño solo con la biblioteca estándar y devuelve lo mismo que
+    la ruta con pandas ({nombre_normalizado: (precio, tallas)}), o None si la
+    hoja tiene algo que no sabe tratar igual (fechas, encabezados repetidos...)
+    y hay que leerla con pandas.
+    """
+    import zipfile
+    from xml.etree import ElementTree as ET
+    try:
+        with zipfile.ZipFile(ruta_excel) as z:
+            filas = _filas_xlsx(z)
+    except (KeyError, ValueError, AttributeError, IndexError, zipfile.BadZipFile, ET.ParseError):
+        return None
+    if not filas or len(set(filas[0])) != len(filas[0]):
+        return None
+    encabezados = filas[0]
+    col_nombre, col_precio, col_tallas = _detectar_columnas(encabezados)
     if col_nombre is None:
-        print("No se encontró columna de nombre en el Excel. Encabezados esperados: Nombre, nombre_producto")
-        return {}
+        return None
+    i_nombre = encabezados.index(col_nombre)
+    i_precio = encabezados.index(col_precio) if col_precio is not None else None
+    i_tallas = encabezados.index(col_tallas) if col_tallas is not None else None
+
+    def celda(fila, i, defecto):
+        valor = fila[i].strip() if i is not None and i < len(fila) else ""
+        return valor or defecto
+
     datos = {}
-    for _, row in df.iterrows():
-        nombre_raw = str(row.get(col_nombre, "")).strip()
-        if not nombre_raw:
-            continue
-        precio_raw = str(row.get(col_precio, "")).strip() if col_precio else ""
-        tallas_raw = str(row.get(col_tallas, "")).strip() if col_tallas else ""
-        nombre_norm = normalize_text(nombre_raw)
-        datos[nombre_norm] = (precio_raw if precio_raw else "N/D", tallas_raw if tallas_raw else "Consultar")
+    validas = 0
+    for fila in filas[1:]:
+        nombre = fila[i_nombre].strip() if i_nombre < len(fila) else ""
+        if nombre:
+            datos[normalize_text(nombre)] = (celda(fila, i_precio, "N/D"), celda(fila, i_tallas, "Consultar"))
+            validas += 1
+    METRICAS.fijar("excel", filas=validas, lector="ligero")
     return datos
 
-def js_escape(s: str) -> str:
-    """Escapa comillas simples y barras para literales JS entre comillas simples."""
-    return s.replace("\\", "\\\\").replace("'", "\\'")
+def leer_excel(ruta_excel, usar_cache=CACHE_EXCEL, solo_columnas=True):
+    """
+    Lee un Excel con columnas que contengan (insensible a mayúsculas):
+    nombre / nombre_producto / Name / producto
+    precio / Precio / price
+    tallas / Tallas / sizes
+    Devuelve un diccionario normalizado: {nombre_normalizado: (precio, tallas)}
+    Con `usar_cache` reutiliza la tabla ya normalizada mientras el archivo no
+    cambie; con `solo_columnas` lee del .xlsx únicamente las columnas detectadas.
+    Los archivos de hasta EXCEL_LIGERO_MAX_BYTES se leen sin pandas cuando es posible.
+    """
+    if not os.path.exists(ruta_excel):
+        print(f"No se encontró el archivo Excel: {ruta_excel}")
+        return {}
+    if os.path.getsize(ruta_excel) <= EXCEL_LIGERO_MAX_BYTES:
+        datos = _leer_xlsx_ligero(ruta_excel)
+        if datos is not None:
+            return datos
+    if usar_cache:
+        tabla = _leer_cache_excel(ruta_excel)
+        if tabla is not None:
+            METRICAS.fijar("excel", filas=len(tabla), lector="cache")
+            return _datos_desde_tabla(tabla)
+        st = os.stat(ruta_excel)
+        sha256 = _sha256_archivo(ruta_excel)
+
+    import pandas as pd
+    if solo_columnas:
+        encabezados = pd.read_excel(ruta_excel, nrows=0).columns
+        col_nombre, col_precio, col_tallas = _detectar_columnas(encabezados)
+        usecols = [c for c in (col_nombre, col_precio, col_tallas) if c is not None] if col_nombre else None
+        df = pd.read_excel(ruta_excel, dtype=str, usecols=usecols)
+    else:
+        df = pd.read_excel(ruta_excel, dtype=str)
+        col_nombre, col_precio, col_tallas = _detectar_columnas(df.columns)
+    df = df.fillna("")
+    if col_nombre is None:
+        print("No se encontró columna de nombre en el Excel. Encabezados esperados: Nombre, nombre_producto")
+        return {}
+    tabla = _normalizar_tabla(df, col_nombre, col_precio, col_tallas)
+    if usar_cache:
+        try:
+            _guardar_cache_excel(ruta_excel, tabla, st, sha256)
+        except Exception as e:
+            # La caché es opcional: si falla, la generación sigue sin ella
+            print("No se pudo guardar la caché del Excel:", e)
+    METRICAS.fijar("excel", filas=len(tabla), lector="pandas")
+    return _datos_desde_tabla(tabla)
+
+# -------------------------
+# Coincidencia de nombres
+# -------------------------
+
+def _forma_canonica(nombre_norm):
+    """Nombre normalizado con espacios colapsados y sin la "s" final de plural en cada palabra."""
+    return " ".join(p[:-1] if len(p) > 3 and p.endswith("s") else p for p in nombre_norm.split())
+
+def _trigramas(texto):
+    """Conjunto de trigramas del texto, con relleno en los bordes."""
+    texto = f"  {texto} "
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+def _numeros(texto):
+    """Palabras con dígitos (tallas, versiones, modelos): deben coincidir siempre."""
+    return frozenset(p for p in texto.split() if any(ch.isdigit() for ch in p))
+
+class IndiceNombres:
+    """
+    Índice invertido de trigramas sobre los nombres normalizados del Excel.
+    `buscar` devuelve el nombre más parecido a un título (similitud de Dice entre
+    trigramas) sin compararlo con todas las filas: solo se recorren las listas de
+    los trigramas menos frecuentes del título, que son las únicas que pueden
+    contener un nombre por encima del umbral (filtro de prefijo).
+    Dos nombres cuyas palabras con números difieren nunca se emparejan.
+    Las filas que se reducen a la misma forma canónica cuentan como un solo
+    nombre; `representante` da, para cada clave, la primera de su grupo.
+    """
+
+    def __init__(self, claves, umbral=UMBRAL_SIMILITUD):
+        self.umbral = umbral
+        self.claves = []
+        self.representante = {}
+        self._exactas = set()
+        self._canonicas = {}
+        self._trigramas = []
+        # Un índice por cada conjunto de palabras con números (solo se busca en el propio);
+        # cada lista de trigrama se separa por número de trigramas del nombre.
+        self._indices = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
+        self._frecuencias = defaultdict(lambda: defaultdict(int))
+        for clave in claves:
+            self._exactas.add(clave)
+            canonica = _forma_canonica(clave)
+            if canonica in self._canonicas:
+                self.representante[clave] = self.claves[self._canonicas[canonica]]
+                continue
+            self.representante[clave] = clave
+            idx = len(self.claves)
+            self.claves.append(clave)
+            self._canonicas[canonica] = idx
+            tris = _trigramas(canonica)
+            self._trigramas.append(tris)
+            numeros = _numeros(canonica)
+            indice = self._indices[numeros]
+            frecuencias = self._frecuencias[numeros]
+            for t in tris:
+                indice[t][len(tris)].append(idx)
+                frecuencias[t] += 1
+
+    def buscar(self, nombre_norm):
+        """
+        Devuelve (clave_excel, puntuación) o (None, 0.0) si nada supera el umbral.
+        La puntuación es 1.0 si el nombre coincide exactamente o en su forma canónica.
+        """
+        if nombre_norm in self._exactas:
+            return nombre_norm, 1.0
+        canonica = _forma_canonica(nombre_norm)
+        idx = self._canonicas.get(canonica)
+        if idx is not None:
+            return self.claves[idx], 1.0
+        numeros = _numeros(canonica)
+        indice = self._indices.get(numeros)
+        if self.umbral >= 1.0 or not canonica or indice is None:
+            return None, 0.0
+        frecuencias = self._frecuencias[numeros]
+        tris = _trigramas(canonica)
+        u = self.umbral
+        # Para Dice >= u hacen falta al menos u*|A|/(2-u) trigramas comunes, así que
+        # basta con mirar los |A| - ese mínimo + 1 trigramas más raros del título,
+        # y solo entre nombres de entre u*|A|/(2-u) y (2-u)*|A|/u trigramas.
+        minimo = int(-(-u * len(tris) // (2 - u)))
+        maximo = int((2 - u) * len(tris) / u)
+        raros = sorted(tris, key=lambda t: frecuencias.get(t, 0))
+        candidatos = set()
+        for t in raros[:len(tris) - minimo + 1]:
+            por_longitud = indice.get(t)
+            if por_longitud is None:
+                continue
+            for longitud in range(minimo, maximo + 1):
+                candidatos.update(por_longitud.get(longitud, ()))
+        mejor, mejor_idx = 0.0, None
+        for idx in sorted(candidatos):
+            otros = self._trigramas[idx]
+            puntuacion = 2 * len(tris & otros) / (len(tris) + len(otros))
+            if puntuacion > mejor:
+                mejor, mejor_idx = puntuacion, idx
+        if mejor_idx is None or mejor < u:
+            return None, 0.0
+        return self.claves[mejor_idx], mejor
 
 # -------------------------
 # Generación del HTML
 # -------------------------
 
-def generar_html(productos, datos_excel, archivo=OUTPUT_HTML):
-    ruta_actual = os.path.dirname(os.path.abspath(__file__))
-    archivo_salida = os.path.join(ruta_actual, archivo)
+_RE_HUECO = re.compile(r"\{\{\s*(\w+)\s*\}\}")
 
-    html_head = f"""<!DOCTYPE html>
-<html lang="es">
-<head>
-<meta charset="UTF-8">
-<meta name="viewport" content="width=device-width, initial-scale=1">
-<title>{html.escape(STORE_NAME)}</title>
-<link href="https://fonts.googleapis.com/css2?family=Montserrat:wght@400;700;900&display=swap" rel="stylesheet">
-<link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/swiper@11/swiper-bundle.min.css"/>
-<link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.5.0/css/all.min.css"/>
-<style>
-:root{{
+class Plantilla:
+    """
+    Plantilla con huecos {{ nombre }} que se analiza una sola vez al cargar el
+    módulo y queda convertida en una función con un único f-string, tan rápida
+    como escribir el f-string a mano: render(nombre=..., ...) -> str.
+    El código de esa función se arma solo con los nombres de los huecos (que
+    deben ser identificadores); el texto de la plantilla nunca pasa por compile:
+    llega a la función como variables libres _t0, _t1...
+    """
+
+    def __init__(self, texto):
+        trozos = _RE_HUECO.split(texto)
+        nombres = trozos[1::2]
+        self.huecos = list(dict.fromkeys(nombres))
+        for nombre in self.huecos:
+            if not nombre.isidentifier() or keyword.iskeyword(nombre) or nombre.startswith("_t"):
+                raise ValueError(f"Nombre de hueco no válido: {nombre!r}")
+        estaticos = trozos[0::2]
+        cuerpo = "".join(("{_t%d}" % k if estatico else "") + ("{%s}" % nombres[k] if k < len(nombres) else "")
+                         for k, estatico in enumerate(estaticos))
+        parametros = ", ".join(["*"] + self.huecos) if self.huecos else ""
+        codigo = (f"def _fabrica({', '.join(f'_t{k}' for k in range(len(estaticos)))}):\n"
+                  f"    def render({parametros}):\n"
+                  f"        return f{cuerpo!r}\n"
+                  f"    return render\n")
+        espacio = {}
+        exec(compile(codigo, "<plantilla>", "exec"), espacio)
+        self.render = espacio["_fabrica"](*estaticos)
+
+_MARCA_SWIPER = "__SWIPER_ID__"
+
+def _hash_json(valor):
+    return hashlib.sha256(json.dumps(valor, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+@functools.lru_cache(maxsize=None)
+def _version_generador():
+    """Hash del propio script: si cambian las plantillas, se invalida todo lo cacheado."""
+    with open(os.path.abspath(__file__), "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def _leer_manifiesto(ruta):
+    try:
+        with open(ruta, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+# Ancho con el que se muestra cada imagen según el diseño (una, dos o tres columnas)
+_SIZES_IMAGEN = "(max-width:768px) 94vw, (max-width:1024px) 45vw, 30vw"
+
+_PLANTILLA_TARJETA = Plantilla("""
+  <div class="producto">
+    <h2>{{ nombre }}</h2>
+    <div class="precio">Precio: ₡{{ precio }}</div>
+    <div class="tallas">Tallas disponibles: {{ tallas }}</div>
+    <div class="swiper" id="{{ swiper_id }}">
+      <div class="swiper-wrapper">
+{{ slides }}      </div>
+      <div class="swiper-pagination"></div>
+    </div>
+    <button class="boton" type="button" data-agregar data-nombre="{{ nombre }}" data-precio="{{ precio }}" data-precio-num="{{ precio_num }}" data-tallas="{{ tallas }}">🛒 Agregar al carrito</button>
+  </div>
+""")
+
+_PLANTILLA_SLIDE = Plantilla(
+    '        <div class="swiper-slide"><img src="{{ src }}" alt="{{ alt }}" loading="lazy"></div>\n')
+
+_PLANTILLA_SLIDE_SRCSET = Plantilla(
+    '        <div class="swiper-slide"><img src="{{ src }}" srcset="{{ srcset }}" sizes="{{ sizes }}" alt="{{ alt }}" loading="lazy"></div>\n')
+
+_SLIDE_SIN_IMAGEN = '        <div class="swiper-slide" style="display:flex;align-items:center;justify-content:center;background:#222;color:#888;">Sin imagen</div>\n'
+
+# Precios y tallas se repiten mucho entre productos: se escapan una sola vez
+_escapar_repetido = functools.lru_cache(maxsize=4096)(html.escape)
+
+# Tallas sueltas ("40", "38.5" o "38,5", "M") o rangos ("38-42", "38 a 42") dentro del texto de tallas
+# Las tallas de letra solo en mayúsculas: sin distinguir, la "s" o la "m" sueltas de
+# un texto normal ("talla s/n", "de 1 m") se tomarían por tallas
+_RE_TALLA = re.compile(r"(\d+(?:[.,]5\b)?)(?:\s*(?:-|(?i:al|a))\s*(\d+(?:[.,]5\b)?))?|\b(XXXL|XXL|XL|XS|S|M|L)\b")
+_ORDEN_TALLAS_LETRA = ("XS", "S", "M", "L", "XL", "XXL", "XXXL")
+
+@functools.lru_cache(maxsize=4096)
+def _tallas_de_texto(tallas):
+    """Tallas que menciona el texto de la columna tallas, sin repetir ("Consultar" -> ())."""
+    encontradas = []
+    for desde, hasta, letra in _RE_TALLA.findall(tallas):
+        if letra:
+            encontradas.append(letra.upper())
+            continue
+        desde = desde.replace(",", ".")
+        hasta = hasta.replace(",", ".")
+        if hasta and desde.isdigit() and hasta.isdigit() and 0 < int(hasta) - int(desde) <= 20:
+            encontradas.extend(str(t) for t in range(int(desde), int(hasta) + 1))
+        else:
+            encontradas.extend(t for t in (desde, hasta) if t)
+    return tuple(dict.fromkeys(encontradas))
+
+def _orden_talla(talla):
+    """Las numéricas de menor a mayor y después las de letra en su orden habitual."""
+    if talla in _ORDEN_TALLAS_LETRA:
+        return (1, _ORDEN_TALLAS_LETRA.index(talla))
+    return (0, float(talla))
+
+@functools.lru_cache(maxsize=4096)
+def _precio_numerico(precio):
+    """
+    Precio del Excel como número, o None si no lo es ("N/D", "Consultar"...).
+    Acepta "45000", "45.000" y "45,000" (miles), "₡45 000", "12.5" o "12,50"
+    (decimales) y "1.234,50" / "1,234.50".
+    """
+    limpio = re.sub(r"[^\d.,]", "", precio)
+    if "." in limpio and "," in limpio:
+        # El último separador es el decimal
+        corte = max(limpio.rfind("."), limpio.rfind(","))
+        limpio = re.sub(r"\D", "", limpio[:corte]) + "." + limpio[corte + 1:]
+    elif re.fullmatch(r"\d{1,3}(?:[.,]\d{3})+", limpio):
+        return int(re.sub(r"\D", "", limpio))
+    if not re.fullmatch(r"\d+(?:[.,]\d+)?", limpio):
+        return None
+    numero = float(limpio.replace(",", "."))
+    return int(numero) if numero.is_integer() else numero
+
+@functools.lru_cache(maxsize=4096)
+def _precio_num_atributo(precio):
+    """Precio numérico para data-precio-num ("" si no es un número)."""
+    numero = _precio_numerico(precio)
+    return "" if numero is None else str(numero)
+
+def _json_en_script(valor):
+    """JSON compacto que se puede incrustar tal cual en un <script type="application/json">."""
+    return json.dumps(valor, ensure_ascii=False, separators=(",", ":")).replace("<", "\\u003c")
+
+class _EntradasEnDisco:
+    """
+    Lista de entradas del índice de búsqueda guardada en un temporal anónimo (una
+    línea JSON por entrada), para el modo streaming: `append` como una lista y,
+    una vez completa, se puede recorrer varias veces.
+    """
+
+    def __init__(self):
+        self._archivo = tempfile.TemporaryFile("w+", encoding="utf-8")
+
+    def append(self, entrada):
+        self._archivo.write(json.dumps(entrada, ensure_ascii=False, separators=(",", ":")))
+        self._archivo.write("\n")
+
+    def __iter__(self):
+        self._archivo.seek(0)
+        try:
+            for linea in self._archivo:
+                yield json.loads(linea)
+        finally:
+            self._archivo.seek(0, os.SEEK_END)
+
+    def close(self):
+        self._archivo.close()
+
+def _lista_json(valores, por_trozo=1000):
+    """Los elementos de `valores` como lista JSON compacta, en trozos de `por_trozo`."""
+    yield "["
+    separador = ""
+    for grupo in _agrupar(valores, por_trozo):
+        yield separador + json.dumps(grupo, ensure_ascii=False, separators=(",", ":"))[1:-1]
+        separador = ","
+    yield "]"
+
+def _json_indice_busqueda(entradas):
+    """
+    Índice de búsqueda en columnas, en el orden de las tarjetas: nombres
+    normalizados, precios numéricos (null si no hay), por producto las
+    posiciones de sus tallas en "valores_talla" y, en "articulos", su nombre,
+    precio y tallas tal como se muestran (con ellos se rehace el carrito guardado).
+    Se entrega como trozos de JSON recorriendo `entradas` una vez por columna,
+    sin armar el índice completo en memoria.
+    """
+    valores = sorted({t for _, _, tallas, _ in entradas for t in tallas}, key=_orden_talla)
+    posicion = {t: i for i, t in enumerate(valores)}
+    yield '{"nombres":'
+    yield from _lista_json(nombre for nombre, _, _, _ in entradas)
+    yield ',"precios":'
+    yield from _lista_json(precio for _, precio, _, _ in entradas)
+    yield ',"tallas":'
+    yield from _lista_json([posicion[t] for t in tallas] for _, _, tallas, _ in entradas)
+    yield ',"valores_talla":'
+    yield from _lista_json(valores)
+    yield ',"articulos":'
+    yield from _lista_json(articulo for _, _, _, articulo in entradas)
+    yield "}"
+
+def _escribir_indice_busqueda(archivo_salida, entradas):
+    """
+    Publica el índice de búsqueda junto a `archivo_salida` como
+    "<base>-busqueda.<hash>.json" y devuelve ese nombre. El hash es del
+    contenido: el navegador lo puede cachear y, si ya existe, no se reescribe.
+    """
+    carpeta, nombre = os.path.split(archivo_salida)
+    base = os.path.splitext(nombre)[0]
+    provisional = os.path.join(carpeta, f".{base}-busqueda.json")
+    huella = _escribir_atomico(provisional, _json_indice_busqueda(entradas))[0]
+    nombre_indice = f"{base}-busqueda.{huella[:12]}.json"
+    ruta = os.path.join(carpeta, nombre_indice)
+    if os.path.exists(ruta):
+        os.remove(provisional)
+    else:
+        os.replace(provisional, ruta)
+    return nombre_indice
+
+def _borrar_indices_busqueda(carpeta, base, actual=None):
+    """Borra los "<base>-busqueda.<hash>.json" de `carpeta` salvo `actual`; devuelve cuántos."""
+    patron = re.compile(re.escape(base) + r"-busqueda\.[0-9a-f]{12}\.json")
+    borrados = 0
+    for nombre in os.listdir(carpeta or "."):
+        if patron.fullmatch(nombre) and nombre != actual:
+            os.remove(os.path.join(carpeta, nombre))
+            borrados += 1
+    return borrados
+
+def _render_tarjeta(nombre, precio, tallas, imagenes, variantes=None):
+    """
+    HTML de una tarjeta de producto; el id del swiper queda como _MARCA_SWIPER.
+    Las imágenes con variantes locales se emiten con srcset/sizes. El botón lleva
+    los datos del producto en atributos data-* (el precio ya convertido a número).
+    """
+    nombre_esc = html.escape(nombre)
+    precio_esc = _escapar_repetido(precio)
+    tallas_esc = _escapar_repetido(tallas)
+
+    slides = []
+    for i, img in enumerate(imagenes):
+        locales = variantes[i] if variantes and i < len(variantes) else None
+        if locales:
+            slides.append(_PLANTILLA_SLIDE_SRCSET.render(
+                src=html.escape(locales[len(locales) // 2][0]),
+                srcset=html.escape(", ".join(f"{ruta} {ancho}w" for ruta, ancho in locales)),
+                sizes=_SIZES_IMAGEN,
+                alt=nombre_esc,
+            ))
+        else:
+            slides.append(_PLANTILLA_SLIDE.render(src=html.escape(img), alt=nombre_esc))
+
+    return _PLANTILLA_TARJETA.render(
+        nombre=nombre_esc,
+        precio=precio_esc,
+        tallas=tallas_esc,
+        swiper_id=_MARCA_SWIPER,
+        slides="".join(slides) if slides else _SLIDE_SIN_IMAGEN,
+        precio_num=_precio_num_atributo(precio),
+    )
+
+# Estilos de la página (se minifican e incrustan en <head> al generar)
+_CSS_CATALOGO = """:root{
   --bg:#000;
   --card:#0f0f0f;
   --accent:#25D366;
@@ -138,69 +1456,84 @@ def generar_html(productos, datos_excel, archivo=OUTPUT_HTML):
   --icon-bg: rgba(255,255,255,0.02);
   --header-height-desktop: 90px;
   --header-height-mobile: 110px;
-}}
-*{{box-sizing:border-box}}
-html,body{{height:100%}}
-body{{margin:0;background:var(--bg);font-family:'Montserrat',sans-serif;color:#fff;-webkit-font-smoothing:antialiased}}
+}
+*{box-sizing:border-box}
+html,body{height:100%}
+body{margin:0;background:var(--bg);font-family:'Montserrat',sans-serif;color:#fff;-webkit-font-smoothing:antialiased}
 
 /* Header */
-header{{position:fixed;top:0;left:0;width:100%;background:var(--card);display:flex;justify-content:center;align-items:center;padding:12px 18px;z-index:10000;height:var(--header-height-desktop);box-shadow:0 2px 12px rgba(0,0,0,0.6)}}
-.header-inner{{width:95%;max-width:1200px;display:flex;justify-content:space-between;align-items:center;gap:12px}}
-header h1{{margin:0;color:#fff;font-weight:900;letter-spacing:0.4px;font-size:clamp(20px,2.6vw+12px,36px);line-height:1.05;text-align:left;max-width:62%;overflow-wrap:break-word}}
+header{position:fixed;top:0;left:0;width:100%;background:var(--card);display:flex;justify-content:center;align-items:center;padding:12px 18px;z-index:10000;height:var(--header-height-desktop);box-shadow:0 2px 12px rgba(0,0,0,0.6)}
+.header-inner{width:95%;max-width:1200px;display:flex;justify-content:space-between;align-items:center;gap:12px}
+header h1{margin:0;color:#fff;font-weight:900;letter-spacing:0.4px;font-size:clamp(20px,2.6vw+12px,36px);line-height:1.05;text-align:left;max-width:62%;overflow-wrap:break-word}
 
 /* Right group */
-.header-right{{display:flex;align-items:center;gap:12px;justify-content:flex-end;width:38%}}
-.redes{{display:flex;gap:10px;align-items:center}}
-.redes a{{color:var(--danger);text-decoration:none;display:flex;align-items:center;justify-content:center;width:36px;height:36px;border-radius:8px;background:var(--icon-bg);font-size:18px}}
-#toggleCarrito{{position:relative;background:var(--accent);color:#fff;padding:8px 12px;border-radius:20px;display:flex;align-items:center;gap:8px;font-weight:700;cursor:pointer;box-shadow:0 6px 18px rgba(0,0,0,0.45)}}
-#toggleCarrito .badge{{background:var(--danger);color:#fff;font-weight:800;font-size:12px;padding:3px 7px;border-radius:12px;min-width:20px;text-align:center}}
+.header-right{display:flex;align-items:center;gap:12px;justify-content:flex-end;width:38%}
+.redes{display:flex;gap:10px;align-items:center}
+.redes a{color:var(--danger);text-decoration:none;display:flex;align-items:center;justify-content:center;width:36px;height:36px;border-radius:8px;background:var(--icon-bg);font-size:18px}
+#toggleCarrito{position:relative;background:var(--accent);color:#fff;padding:8px 12px;border-radius:20px;display:flex;align-items:center;gap:8px;font-weight:700;cursor:pointer;box-shadow:0 6px 18px rgba(0,0,0,0.45)}
+#toggleCarrito .badge{background:var(--danger);color:#fff;font-weight:800;font-size:12px;padding:3px 7px;border-radius:12px;min-width:20px;text-align:center}
 
 /* Carrito panel (desktop default) */
-#carrito{{position:fixed;top:calc(var(--header-height-desktop)+8px);right:20px;background:var(--card);border:2px solid var(--accent);padding:12px;width:360px;max-height:68vh;overflow-y:auto;border-radius:10px;transform:translateY(-8px);opacity:0;pointer-events:none;transition:all .18s ease;z-index:9999}}
-#carrito.visible{{transform:translateY(0);opacity:1;pointer-events:auto}}
-#carrito h3{{margin:0 0 10px;text-align:center;font-weight:800}}
-#carrito ul{{list-style:none;padding:0;margin:0}}
-#carrito li{{display:flex;justify-content:space-between;align-items:center;padding:8px 0;border-bottom:1px solid rgba(255,255,255,0.03)}}
-#carrito .empty{{color:#bbb;text-align:center;padding:12px 0}}
-#carrito button.remove-item{{background:#ff3b3b;color:#fff;border:none;padding:6px 8px;border-radius:6px;cursor:pointer}}
+#carrito{position:fixed;top:calc(var(--header-height-desktop)+8px);right:20px;background:var(--card);border:2px solid var(--accent);padding:12px;width:360px;max-height:68vh;overflow-y:auto;border-radius:10px;transform:translateY(-8px);opacity:0;pointer-events:none;transition:all .18s ease;z-index:9999}
+#carrito.visible{transform:translateY(0);opacity:1;pointer-events:auto}
+#carrito h3{margin:0 0 10px;text-align:center;font-weight:800}
+#carrito ul{list-style:none;padding:0;margin:0}
+#carrito li{display:flex;justify-content:space-between;align-items:center;padding:8px 0;border-bottom:1px solid rgba(255,255,255,0.03)}
+#carrito .empty{color:#bbb;text-align:center;padding:12px 0}
+#carrito button.remove-item{background:#ff3b3b;color:#fff;border:none;padding:6px 8px;border-radius:6px;cursor:pointer}
+#carrito .item-nombre{flex:1;margin-right:8px}
+#carrito .item-cantidad{display:flex;align-items:center;gap:6px;margin-right:8px}
+#carrito .item-cantidad button{background:var(--icon-bg);color:#fff;border:1px solid rgba(255,255,255,0.2);width:26px;height:26px;border-radius:6px;cursor:pointer;font-weight:800}
 
 /* Catalog */
-.catalogo{{margin-top:calc(var(--header-height-desktop)+20px);width:95%;margin-left:auto;margin-right:auto;display:flex;flex-wrap:wrap;justify-content:space-around;gap:16px;padding-bottom:80px}}
-.producto{{width:30%;background:var(--card);margin:10px;padding:16px;border-radius:12px;box-shadow:0 8px 24px rgba(0,0,0,0.6);transition:transform .12s ease}}
-.producto:hover{{transform:translateY(-6px)}}
-.producto h2{{font-size:18px;color:#fff;text-align:center;margin:8px 0;font-weight:800}}
-.producto .precio{{font-size:16px;color:var(--muted);text-align:center;margin:6px 0;font-weight:700}}
-.producto .tallas{{font-size:14px;color:var(--muted);text-align:center;margin:6px 0}}
-.swiper{{width:100%;height:280px;border-radius:10px;overflow:hidden;background:#000}}
-.swiper-slide img{{width:100%;height:100%;object-fit:cover;display:block}}
-.swiper-pagination{{bottom:10px!important}}
-.boton{{display:flex;align-items:center;justify-content:center;gap:8px;margin:12px auto 0;padding:12px 18px;background:#fff;color:#000;border:none;border-radius:10px;cursor:pointer;font-weight:900;font-size:16px}}
+.catalogo{margin-top:calc(var(--header-height-desktop)+20px);width:95%;margin-left:auto;margin-right:auto;display:flex;flex-wrap:wrap;justify-content:space-around;gap:16px;padding-bottom:80px}
+.producto{width:30%;background:var(--card);margin:10px;padding:16px;border-radius:12px;box-shadow:0 8px 24px rgba(0,0,0,0.6);transition:transform .12s ease}
+.producto:hover{transform:translateY(-6px)}
+.producto h2{font-size:18px;color:#fff;text-align:center;margin:8px 0;font-weight:800}
+.producto .precio{font-size:16px;color:var(--muted);text-align:center;margin:6px 0;font-weight:700}
+.producto .tallas{font-size:14px;color:var(--muted);text-align:center;margin:6px 0}
+.swiper{width:100%;height:280px;border-radius:10px;overflow:hidden;background:#000}
+.swiper-slide img{width:100%;height:100%;object-fit:cover;display:block}
+.swiper-pagination{bottom:10px!important}
+.boton{display:flex;align-items:center;justify-content:center;gap:8px;margin:12px auto 0;padding:12px 18px;background:#fff;color:#000;border:none;border-radius:10px;cursor:pointer;font-weight:900;font-size:16px}
+
+/* Búsqueda y filtros */
+.filtros{margin:calc(var(--header-height-desktop)+20px) auto 0;width:95%;max-width:1200px;display:flex;flex-wrap:wrap;gap:10px;align-items:center}
+.filtros input,.filtros select{background:var(--card);color:#fff;border:1px solid rgba(255,255,255,0.15);border-radius:8px;padding:10px 12px;font:inherit;font-size:15px}
+#filtro-texto{flex:1 1 240px}
+#filtro-precio-min,#filtro-precio-max{width:130px}
+#filtro-resultados{color:var(--muted);font-size:14px}
+.filtros + .catalogo{margin-top:16px}
+.producto[hidden]{display:none !important}
 
 /* Responsive adjustments */
-@media (min-width:1200px){{header h1{{font-size:34px}} .redes a{{width:40px;height:40px;font-size:20px}}}}
-@media (max-width:1024px){{.producto{{width:45%}}}}
+@media (min-width:1200px){header h1{font-size:34px} .redes a{width:40px;height:40px;font-size:20px}}
+@media (max-width:1024px){.producto{width:45%}}
 
 /* MOBILE: carrito compacto y una columna de productos */
-@media (max-width:768px){{
-  :root {{ --header-height-mobile: 100px; }}
-  header{{height:var(--header-height-mobile);padding:10px 10px}}
-  .header-inner{{width:96%;display:flex;flex-direction:column;align-items:center;gap:8px}}
-  header h1{{font-size:clamp(16px,5.0vw,30px);text-align:center;max-width:100%;margin:0;padding:0 6px;line-height:1.02}}
-  .header-right{{width:100%;display:flex;justify-content:center;gap:10px;align-items:center}}
-  .redes a{{width:48px;height:48px;font-size:22px;border-radius:10px}}
-  #toggleCarrito{{padding:10px 12px;font-size:16px;border-radius:20px}}
-  #toggleCarrito .badge{{min-width:24px;padding:4px 8px;font-size:12px}}
+@media (max-width:768px){
+  :root { --header-height-mobile: 100px; }
+  header{height:var(--header-height-mobile);padding:10px 10px}
+  .header-inner{width:96%;display:flex;flex-direction:column;align-items:center;gap:8px}
+  header h1{font-size:clamp(16px,5.0vw,30px);text-align:center;max-width:100%;margin:0;padding:0 6px;line-height:1.02}
+  .header-right{width:100%;display:flex;justify-content:center;gap:10px;align-items:center}
+  .redes a{width:48px;height:48px;font-size:22px;border-radius:10px}
+  #toggleCarrito{padding:10px 12px;font-size:16px;border-radius:20px}
+  #toggleCarrito .badge{min-width:24px;padding:4px 8px;font-size:12px}
 
   /* Forzar una sola columna y diseño moderno */
-  .catalogo{{margin-top:calc(var(--header-height-mobile)+8px) !important;display:flex !important;flex-direction:column !important;align-items:center !important;gap:12px !important;padding-bottom:100px !important;height:auto !important;overflow-y:visible !important;scroll-snap-type:none !important;flex-wrap:nowrap !important}}
-  .producto{{width:94% !important;padding:14px !important;margin:0 0 12px !important;border-radius:12px !important;height:auto !important;min-height:320px !important;box-shadow:0 8px 24px rgba(0,0,0,0.55) !important}}
-  .producto h2{{font-size:20px}}
-  .producto .precio{{font-size:16px}}
-  .producto .tallas{{font-size:14px}}
-  .swiper{{height:36vh !important}}
+  .catalogo{margin-top:calc(var(--header-height-mobile)+8px) !important;display:flex !important;flex-direction:column !important;align-items:center !important;gap:12px !important;padding-bottom:100px !important;height:auto !important;overflow-y:visible !important;scroll-snap-type:none !important;flex-wrap:nowrap !important}
+  .filtros{margin-top:calc(var(--header-height-mobile)+8px);width:94%}
+  .filtros + .catalogo{margin-top:12px !important}
+  #filtro-precio-min,#filtro-precio-max{flex:1 1 40%;width:auto}
+  .producto{width:94% !important;padding:14px !important;margin:0 0 12px !important;border-radius:12px !important;height:auto !important;min-height:320px !important;box-shadow:0 8px 24px rgba(0,0,0,0.55) !important}
+  .producto h2{font-size:20px}
+  .producto .precio{font-size:16px}
+  .producto .tallas{font-size:14px}
+  .swiper{height:36vh !important}
 
   /* CARRO COMPACTO: bottom sheet, más pequeño y editable */
-  #carrito{{
+  #carrito{
     position:fixed !important;
     bottom:12px !important;
     left:6% !important;
@@ -215,137 +1548,240 @@ header h1{{margin:0;color:#fff;font-weight:900;letter-spacing:0.4px;font-size:cl
     opacity:1 !important;
     pointer-events:auto !important;
     box-shadow:0 12px 30px rgba(0,0,0,0.6) !important;
-  }}
-  #carrito h3{{font-size:16px;margin:0 0 8px}}
-  #lista-carrito{{max-height:calc(48vh - 120px);overflow-y:auto;padding-right:6px;margin:0}}
-  #lista-carrito li{{font-size:13px;padding:6px 0;display:flex;justify-content:space-between;gap:8px;align-items:center}}
-  #lista-carrito button{{padding:6px 8px;font-size:12px;border-radius:6px}}
-  #carrito-total{{font-size:13px;margin-top:8px}}
-  a#whatsapp{{display:inline-block;width:100%;padding:10px 12px;font-size:14px;border-radius:8px;text-decoration:none}}
-  .boton{{padding:14px 18px;font-size:16px}}
-}}
+  }
+  #carrito h3{font-size:16px;margin:0 0 8px}
+  #lista-carrito{max-height:calc(48vh - 120px);overflow-y:auto;padding-right:6px;margin:0}
+  #lista-carrito li{font-size:13px;padding:6px 0;display:flex;justify-content:space-between;gap:8px;align-items:center}
+  #lista-carrito button{padding:6px 8px;font-size:12px;border-radius:6px}
+  #carrito-total{font-size:13px;margin-top:8px}
+  a#whatsapp{display:inline-block;width:100%;padding:10px 12px;font-size:14px;border-radius:8px;text-decoration:none}
+  .boton{padding:14px 18px;font-size:16px}
+}
 
 /* Very small devices */
-@media (max-width:420px){{
-  header h1{{font-size: clamp(16px, 7.5vw, 28px); }}
-  .redes a{{width:64px;height:64px;font-size:28px}}
-  #toggleCarrito{{font-size:18px;padding:12px 14px}}
-  #toggleCarrito .badge{{min-width:30px;padding:6px 10px;font-size:13px}}
-  .swiper{{height:42vh}}
-  .producto h2{{font-size:18px}}
-  .producto .precio{{font-size:16px}}
-  .boton{{font-size:16px;padding:12px 16px}}
-}}
-</style>
-</head>
-<body>
+@media (max-width:420px){
+  header h1{font-size: clamp(16px, 7.5vw, 28px); }
+  .redes a{width:64px;height:64px;font-size:28px}
+  #toggleCarrito{font-size:18px;padding:12px 14px}
+  #toggleCarrito .badge{min-width:30px;padding:6px 10px;font-size:13px}
+  .swiper{height:42vh}
+  .producto h2{font-size:18px}
+  .producto .precio{font-size:16px}
+  .boton{font-size:16px;padding:12px 16px}
+}
+"""
 
-<header>
-  <div class="header-inner">
-    <h1>{html.escape(STORE_NAME)}</h1>
-    <div class="header-right">
-      <!-- Redes sociales: los href se configuran desde JS -->
-      <div class="redes">
-        <a id="link-facebook" href="#" title="Facebook" target="_blank" rel="noopener noreferrer"><i class="fab fa-facebook-f"></i></a>
-        <a id="link-instagram" href="#" title="Instagram" target="_blank" rel="noopener noreferrer"><i class="fab fa-instagram"></i></a>
-        <a id="link-twitter" href="#" title="Twitter" target="_blank" rel="noopener noreferrer"><i class="fab fa-twitter"></i></a>
-      </div>
+# Subconjunto de Font Awesome: solo los 3 iconos "fab" del header, en lugar de all.min.css
+_CSS_ICONOS = """
+@font-face{font-family:"Font Awesome 6 Brands";font-style:normal;font-weight:400;font-display:block;src:url(https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.5.0/webfonts/fa-brands-400.woff2) format("woff2")}
+.fab{font-family:"Font Awesome 6 Brands";font-weight:400;font-style:normal;display:inline-block;line-height:1;-webkit-font-smoothing:antialiased;text-rendering:auto}
+.fa-facebook-f:before{content:"\\f39e"}
+.fa-instagram:before{content:"\\f16d"}
+.fa-twitter:before{content:"\\f099"}
+"""
 
-      <!-- Botón carrito con badge -->
-      <div id="toggleCarrito" title="Ver carrito" aria-label="Ver carrito">
-        <span>🛒</span>
-        <span class="badge" id="cart-count">0</span>
-      </div>
-    </div>
-  </div>
-</header>
+# Lógica de la página: carrito, WhatsApp, Swiper y carga por partes. Se minifica y se
+# publica como archivo con hash en ASSETS_DIR para que el navegador lo cachee.
+_JS_CATALOGO = """document.addEventListener('DOMContentLoaded', function() {
+  // Configuración de la tienda (se genera desde Python en #config-tienda)
+  const CONFIG = JSON.parse(document.getElementById('config-tienda').textContent);
 
-<!-- Panel carrito -->
-<div id="carrito" aria-hidden="true">
-  <button id="cerrarCarrito" aria-label="Cerrar carrito">✖</button>
-  <h3>Carrito</h3>
-  <ul id="lista-carrito"></ul>
-  <div id="carrito-total" style="margin-top:12px;text-align:right;color:#ddd;font-weight:800;"></div>
+  // Inicializar Swiper en cada contenedor .swiper cuando se acerca a la pantalla
+  function crearSwiper(swiperEl) {
+    new Swiper(swiperEl, {
+      loop: true,
+      pagination: {
+        el: swiperEl.querySelector('.swiper-pagination'),
+        clickable: true
+      },
+      autoplay: {
+        delay: 3500,
+        disableOnInteraction: false
+      }
+    });
+  }
+  const observadorSwiper = ('IntersectionObserver' in window) ? new IntersectionObserver(function(entradas, obs) {
+    entradas.forEach(function(entrada) {
+      if (entrada.isIntersecting) {
+        obs.unobserve(entrada.target);
+        crearSwiper(entrada.target);
+      }
+    });
+  }, { rootMargin: '200px 0px' }) : null;
+  function observarSwipers(elementos) {
+    elementos.forEach(function(swiperEl) {
+      if (observadorSwiper) observadorSwiper.observe(swiperEl);
+      else crearSwiper(swiperEl);
+    });
+  }
+  observarSwipers(document.querySelectorAll('.swiper'));
 
-  <!-- Enlace WhatsApp: href se actualizará desde JS con el número y el mensaje -->
-  <a id="whatsapp" href="#" target="_blank" rel="noopener noreferrer" style="display:block;margin-top:12px;padding:12px;background:var(--accent);color:#fff;text-align:center;border-radius:8px;text-decoration:none;font-weight:800;">
-    Enviar pedido por WhatsApp
-  </a>
-</div>
+  // -----------------------------
+  // Búsqueda y filtros sobre el índice precalculado (columnas en el mismo orden
+  // que las tarjetas, en el JSON CONFIG.busqueda). Cada cambio recalcula qué
+  // tarjetas se ven en un solo recorrido del índice y luego aplica solo las
+  // diferencias al DOM por lotes, un lote por frame, para no bloquear la escritura.
+  // Hasta que llega el índice no se filtra nada.
+  // -----------------------------
+  const catalogoEl = document.getElementById('catalogo');
+  const TARJETAS_POR_FRAME = 400;
+  const tarjetas = Array.from(catalogoEl.querySelectorAll('.producto'));
+  let INDICE = null;
+  let totalProductos = 0;
+  let visibles = null;
+  let mostradas = null;
+  const filtroTexto = document.getElementById('filtro-texto');
+  const filtroTalla = document.getElementById('filtro-talla');
+  const filtroMin = document.getElementById('filtro-precio-min');
+  const filtroMax = document.getElementById('filtro-precio-max');
+  const filtroResultados = document.getElementById('filtro-resultados');
+  let filtroProgramado = false;
+  let loteProgramado = false;
+  let cursor = 0;
+  let filtroActivo = false;
+  // La carga por partes la reemplaza: con un filtro activo se traen todas las
+  // partes que falten, para que los resultados coincidan con el recuento
+  let cargarPartesRestantes = function() {};
 
-<div class="catalogo" id="catalogo">
-"""
+  function usarIndice(indice) {
+    INDICE = indice;
+    totalProductos = INDICE.nombres.length;
+    visibles = new Uint8Array(totalProductos).fill(1);
+    mostradas = new Uint8Array(totalProductos).fill(1);
+    INDICE.valores_talla.forEach(function(talla, i) {
+      const opcion = document.createElement('option');
+      opcion.value = i;
+      opcion.textContent = 'Talla ' + talla;
+      filtroTalla.appendChild(opcion);
+    });
+    // Lo que se haya escrito mientras tanto se aplica ahora
+    programarFiltro();
+  }
 
-    partes = [html_head]
-    contador = 0
+  // Igual que normalize_text en Python: minúsculas y sin tildes
+  function normalizar(texto) {
+    return texto.trim().toLowerCase().normalize('NFKD').replace(/\\p{M}/gu, '');
+  }
 
-    # Generar tarjetas solo para los modelos que están en el Excel (comparación normalizada)
-    for prod in productos:
-        nombre = prod.get("nombre", "")
-        nombre_norm = normalize_text(nombre)
-        if nombre_norm in datos_excel:
-            precio, tallas = datos_excel[nombre_norm]
-            nombre_esc = html.escape(nombre)
-            precio_esc = html.escape(precio)
-            tallas_esc = html.escape(tallas)
-            nombre_js = js_escape(nombre_esc)
-            precio_js = js_escape(precio_esc)
-            tallas_js = js_escape(tallas_esc)
-            swiper_id = f"swiper-{contador}"
-
-            bloque = f"""
-  <div class="producto">
-    <h2>{nombre_esc}</h2>
-    <div class="precio">Precio: ₡{precio_esc}</div>
-    <div class="tallas">Tallas disponibles: {tallas_esc}</div>
-    <div class="swiper" id="{swiper_id}">
-      <div class="swiper-wrapper">
-"""
-            imagenes = prod.get("imagenes", [])
-            if imagenes:
-                for img in imagenes:
-                    img_esc = html.escape(img)
-                    bloque += f'        <div class="swiper-slide"><img src="{img_esc}" alt="{nombre_esc}"></div>\n'
-            else:
-                bloque += '        <div class="swiper-slide" style="display:flex;align-items:center;justify-content:center;background:#222;color:#888;">Sin imagen</div>\n'
+  function filtrar() {
+    filtroProgramado = false;
+    if (INDICE === null) return;
+    const palabras = normalizar(filtroTexto.value).split(/\\s+/).filter(Boolean);
+    const talla = filtroTalla.value === '' ? -1 : Number(filtroTalla.value);
+    const minimo = filtroMin.value === '' ? -Infinity : Number(filtroMin.value);
+    const maximo = filtroMax.value === '' ? Infinity : Number(filtroMax.value);
+    const porPrecio = minimo !== -Infinity || maximo !== Infinity;
+    const nombres = INDICE.nombres, precios = INDICE.precios, tallas = INDICE.tallas;
+    let encontrados = 0;
+    for (let i = 0; i < totalProductos; i++) {
+      let ok = true;
+      for (let k = 0; ok && k < palabras.length; k++) ok = nombres[i].indexOf(palabras[k]) !== -1;
+      if (ok && talla >= 0) ok = tallas[i].indexOf(talla) !== -1;
+      if (ok && porPrecio) ok = precios[i] !== null && precios[i] >= minimo && precios[i] <= maximo;
+      visibles[i] = ok ? 1 : 0;
+      if (ok) encontrados++;
+    }
+    const activo = palabras.length > 0 || talla >= 0 || porPrecio;
+    filtroResultados.textContent = activo ? encontrados + ' de ' + totalProductos + ' productos' : '';
+    filtroActivo = activo;
+    if (activo) cargarPartesRestantes();
+    cursor = 0;
+    if (!loteProgramado) {
+      loteProgramado = true;
+      requestAnimationFrame(aplicarLote);
+    }
+  }
 
-            bloque += f"""      </div>
-      <div class="swiper-pagination"></div>
-    </div>
-    <button class="boton" onclick="agregarCarrito('{nombre_js}', '{precio_js}', '{tallas_js}')">🛒 Agregar al carrito</button>
-  </div>
-"""
-            partes.append(bloque)
-            contador += 1
+  function aplicarLote() {
+    const fin = Math.min(cursor + TARJETAS_POR_FRAME, tarjetas.length);
+    for (; cursor < fin; cursor++) {
+      if (mostradas[cursor] !== visibles[cursor]) {
+        mostradas[cursor] = visibles[cursor];
+        tarjetas[cursor].hidden = !visibles[cursor];
+      }
+    }
+    if (cursor < tarjetas.length) requestAnimationFrame(aplicarLote);
+    else loteProgramado = false;
+  }
 
-    if contador == 0:
-        partes.append("""
-  <div style="width:100%; text-align:center; padding:40px; color:#ddd;">
-    No se encontraron productos que coincidan con el Excel.
-  </div>
-""")
+  // Varias teclas en el mismo frame se resuelven con un único filtrado
+  function programarFiltro() {
+    if (!filtroProgramado) {
+      filtroProgramado = true;
+      requestAnimationFrame(filtrar);
+    }
+  }
+  [filtroTexto, filtroMin, filtroMax].forEach(function(el) { el.addEventListener('input', programarFiltro); });
+  filtroTalla.addEventListener('change', programarFiltro);
 
-    # Footer: scripts y lógica JS (incluye actualización de enlaces de redes y WhatsApp)
-    html_footer = f"""
-</div>
+  // Tarjetas que llegan con las partes del catálogo: se ocultan si el filtro las excluye
+  function agregarTarjetas(nuevas) {
+    nuevas.forEach(function(tarjeta) {
+      const i = tarjetas.length;
+      tarjetas.push(tarjeta);
+      if (visibles !== null && !visibles[i]) {
+        tarjeta.hidden = true;
+        mostradas[i] = 0;
+      }
+    });
+  }
 
-<script src="https://cdn.jsdelivr.net/npm/swiper@11/swiper-bundle.min.js"></script>
-<script>
-document.addEventListener('DOMContentLoaded', function() {{
-  // Inicializar Swiper para cada contenedor .swiper
-  document.querySelectorAll('.swiper').forEach(function(swiperEl) {{
-    new Swiper(swiperEl, {{
-      loop: true,
-      pagination: {{
-        el: swiperEl.querySelector('.swiper-pagination'),
-        clickable: true
-      }},
-      autoplay: {{
-        delay: 3500,
-        disableOnInteraction: false
-      }}
-    }});
-  }});
+  // Catálogo por partes: pedir la siguiente parte cuando el final se acerca a la pantalla
+  const centinela = document.getElementById('catalogo-mas');
+  if (centinela && 'IntersectionObserver' in window) {
+    const REINTENTO_PARTE_MS = 5000;
+    let pendientes = [];
+    let cargando = false;
+    const observadorPartes = new IntersectionObserver(function(entradas) {
+      if (entradas[0].isIntersecting) cargarSiguienteParte();
+    }, { rootMargin: '800px 0px' });
+    function cargarSiguienteParte() {
+      if (cargando) return;
+      if (pendientes.length === 0) {
+        observadorPartes.disconnect();
+        centinela.remove();
+        return;
+      }
+      cargando = true;
+      const parte = pendientes.shift();
+      fetch(parte.archivo).then(function(r) {
+        if (!r.ok) throw new Error('HTTP ' + r.status);
+        return r.text();
+      }).then(function(texto) {
+        const plantilla = document.createElement('template');
+        plantilla.innerHTML = texto;
+        const nuevos = Array.from(plantilla.content.querySelectorAll('.swiper'));
+        agregarTarjetas(Array.from(plantilla.content.querySelectorAll('.producto')));
+        catalogoEl.insertBefore(plantilla.content, centinela);
+        observarSwipers(nuevos);
+        return 0;
+      }, function() {
+        // La parte vuelve a la cola y se reintenta pasado un rato
+        pendientes.unshift(parte);
+        return REINTENTO_PARTE_MS;
+      }).then(function(espera) {
+        setTimeout(function() {
+          cargando = false;
+          if (filtroActivo) {
+            cargarSiguienteParte();
+          } else {
+            // Volver a observar para que se dispare de nuevo si el final sigue visible
+            observadorPartes.unobserve(centinela);
+            observadorPartes.observe(centinela);
+          }
+        }, espera);
+      });
+    }
+    cargarPartesRestantes = cargarSiguienteParte;
+    fetch(centinela.dataset.indice).then(function(r) {
+      if (!r.ok) throw new Error('HTTP ' + r.status);
+      return r.json();
+    }).then(function(indice) {
+      pendientes = indice.partes.slice(1);
+      observadorPartes.observe(centinela);
+      if (filtroActivo) cargarSiguienteParte();
+    });
+  }
 
   // Elementos UI
   const toggleCarrito = document.getElementById('toggleCarrito');
@@ -356,123 +1792,247 @@ document.addEventListener('DOMContentLoaded', function() {{
   const carritoTotal = document.getElementById('carrito-total');
   const whatsappEl = document.getElementById('whatsapp');
 
-  // Estado simple del carrito en memoria
-  let carritoItems = [];
-
-  function actualizarUICarrito() {{
-    listaCarrito.innerHTML = '';
-    if (carritoItems.length === 0) {{
-      listaCarrito.innerHTML = '<li class="empty">El carrito está vacío</li>';
-      carritoTotal.textContent = '';
-    }} else {{
-      let total = 0;
-      carritoItems.forEach(function(it, idx) {{
-        const li = document.createElement('li');
-
-        const cont = document.createElement('div');
-        cont.style.display = 'flex';
-        cont.style.justifyContent = 'space-between';
-        cont.style.alignItems = 'center';
-        cont.style.width = '100%';
-
-        const spanLeft = document.createElement('span');
-        spanLeft.textContent = it.nombre + ' - ₡' + it.precio + ' - ' + it.tallas;
-        spanLeft.style.flex = '1';
-        spanLeft.style.marginRight = '8px';
-
-        const btn = document.createElement('button');
-        btn.textContent = 'Eliminar';
-        btn.className = 'remove-item';
-        btn.onclick = function() {{
-          carritoItems.splice(idx, 1);
-          actualizarUICarrito();
-        }};
-
-        cont.appendChild(spanLeft);
-        cont.appendChild(btn);
-        li.appendChild(cont);
-        listaCarrito.appendChild(li);
-
-        const p = parseFloat(it.precio.replace(/[^0-9.-]+/g,""));
-        if (!isNaN(p)) total += p;
-      }});
-      carritoTotal.textContent = 'Total aproximado: ₡' + total;
-    }}
-    cartCount.textContent = carritoItems.length;
-    actualizarWhatsAppLink();
-  }}
+  // -----------------------------
+  // Carrito: un artículo por producto y tallas, con cantidad. Cada cambio toca
+  // solo su fila; contador, total y enlace de WhatsApp se actualizan una vez por
+  // frame (el total se recalcula desde los artículos, sin acumular redondeos) y el estado se
+  // guarda en localStorage como mucho cada GUARDAR_CADA_MS.
+  // -----------------------------
+  const CLAVE_ALMACEN = 'carrito:' + CONFIG.tienda;
+  const GUARDAR_CADA_MS = 500;
+  const carritoItems = new Map();
+  let unidades = 0;
+  let resumenProgramado = false;
+  let temporizadorGuardado = null;
+  // Hasta rehacer lo guardado (hace falta el índice) no se escribe encima
+  let carritoRestaurado = false;
+  let cambiosSinGuardar = false;
+
+  function claveArticulo(nombre, tallas) {
+    return JSON.stringify([nombre, tallas]);
+  }
+
+  function mostrarVacio() {
+    listaCarrito.innerHTML = '<li class="empty">El carrito está vacío</li>';
+  }
+
+  function crearFila(clave, it) {
+    const li = document.createElement('li');
+    li.dataset.clave = clave;
+    const texto = document.createElement('span');
+    texto.className = 'item-nombre';
+    texto.textContent = it.nombre + ' - ₡' + it.precio + ' - ' + it.tallas;
+    const cantidad = document.createElement('span');
+    cantidad.className = 'item-cantidad';
+    cantidad.innerHTML = '<button type="button" data-accion="menos" aria-label="Quitar uno">−</button>' +
+      '<span></span><button type="button" data-accion="mas" aria-label="Agregar uno">+</button>';
+    const eliminar = document.createElement('button');
+    eliminar.type = 'button';
+    eliminar.className = 'remove-item';
+    eliminar.dataset.accion = 'eliminar';
+    eliminar.textContent = 'Eliminar';
+    li.append(texto, cantidad, eliminar);
+    it.fila = li;
+    it.contador = cantidad.querySelector('span');
+    return li;
+  }
+
+  // Suma `delta` unidades al artículo (lo crea con `datos` si no estaba)
+  function cambiarCantidad(clave, datos, delta) {
+    let it = carritoItems.get(clave);
+    if (!it) {
+      if (!datos || delta <= 0) return;
+      it = { nombre: datos.nombre, precio: datos.precio, precioNum: datos.precioNum, tallas: datos.tallas, cantidad: 0 };
+      if (carritoItems.size === 0) listaCarrito.textContent = '';
+      carritoItems.set(clave, it);
+      listaCarrito.appendChild(crearFila(clave, it));
+    }
+    delta = Math.max(delta, -it.cantidad);
+    it.cantidad += delta;
+    unidades += delta;
+    if (it.cantidad === 0) {
+      it.fila.remove();
+      carritoItems.delete(clave);
+      if (carritoItems.size === 0) mostrarVacio();
+    } else {
+      it.contador.textContent = it.cantidad;
+    }
+    programarResumen();
+    programarGuardado();
+  }
+
+  function formatearPrecio(valor) {
+    return (Math.round(valor * 100) / 100).toLocaleString('es-CR');
+  }
+
+  function programarResumen() {
+    if (!resumenProgramado) {
+      resumenProgramado = true;
+      requestAnimationFrame(actualizarResumen);
+    }
+  }
+
+  function actualizarResumen() {
+    resumenProgramado = false;
+    let total = 0;
+    carritoItems.forEach(function(it) {
+      if (it.precioNum !== null) total += it.precioNum * it.cantidad;
+    });
+    cartCount.textContent = unidades;
+    carritoTotal.textContent = total > 0 ? 'Total aproximado: ₡' + formatearPrecio(total) : '';
+    actualizarWhatsAppLink(total);
+  }
 
   // Función para actualizar enlace de WhatsApp con el pedido actual
-  function actualizarWhatsAppLink() {{
-    const WHATSAPP_NUMBER = "{WHATSAPP_NUMBER}";
+  function actualizarWhatsAppLink(total) {
     if (!whatsappEl) return;
-    if (carritoItems.length === 0) {{
+    if (carritoItems.size === 0) {
       whatsappEl.href = "#";
       whatsappEl.textContent = "Carrito vacío";
       whatsappEl.classList.add('disabled');
       return;
-    }}
-    let mensaje = "Pedido desde {html.escape(STORE_NAME)}%0A%0A";
-    carritoItems.forEach((it, idx) => {{
-      const linea = `${{idx + 1}}. ${{encodeURIComponent(it.nombre)}} - ₡${{encodeURIComponent(it.precio)}} - Tallas: ${{encodeURIComponent(it.tallas)}}`;
-      mensaje += linea + "%0A";
-    }});
-    let total = 0;
-    carritoItems.forEach(it => {{
-      const p = parseFloat(it.precio.replace(/[^0-9.-]+/g,""));
-      if (!isNaN(p)) total += p;
-    }});
-    if (total > 0) {{
-      mensaje += "%0A" + encodeURIComponent("Total aproximado: ₡" + total);
-    }}
-    const waUrl = `https://wa.me/${{WHATSAPP_NUMBER}}?text=${{mensaje}}`;
-    whatsappEl.href = waUrl;
+    }
+    let mensaje = "Pedido desde " + encodeURIComponent(CONFIG.tienda) + "%0A%0A";
+    let n = 0;
+    carritoItems.forEach(function(it) {
+      const cantidad = it.cantidad > 1 ? ` (x${it.cantidad})` : '';
+      n++;
+      mensaje += `${n}. ${encodeURIComponent(it.nombre + cantidad)} - ₡${encodeURIComponent(it.precio)} - Tallas: ${encodeURIComponent(it.tallas)}%0A`;
+    });
+    if (total > 0) {
+      mensaje += "%0A" + encodeURIComponent("Total aproximado: ₡" + formatearPrecio(total));
+    }
+    whatsappEl.href = `https://wa.me/${CONFIG.whatsapp}?text=${mensaje}`;
     whatsappEl.target = "_blank";
     whatsappEl.rel = "noopener noreferrer";
     whatsappEl.classList.remove('disabled');
     whatsappEl.textContent = "Enviar pedido por WhatsApp";
-  }}
+  }
 
-  // Exponer función global para botones "Agregar al carrito"
-  window.agregarCarrito = function(nombre, precio, tallas) {{
-    carritoItems.push({{ nombre: nombre, precio: precio, tallas: tallas }});
-    actualizarUICarrito();
+  // Persistencia: como mucho una escritura cada GUARDAR_CADA_MS, y lo pendiente al salir
+  function programarGuardado() {
+    if (temporizadorGuardado === null) temporizadorGuardado = setTimeout(guardarCarrito, GUARDAR_CADA_MS);
+  }
 
+  function guardarCarrito() {
+    clearTimeout(temporizadorGuardado);
+    temporizadorGuardado = null;
+    if (!carritoRestaurado) {
+      cambiosSinGuardar = true;
+      return;
+    }
+    const datos = Array.from(carritoItems.values(), function(it) {
+      return [it.nombre, it.precio, it.precioNum, it.tallas, it.cantidad];
+    });
+    try {
+      localStorage.setItem(CLAVE_ALMACEN, JSON.stringify(datos));
+    } catch (e) {
+      // Sin almacenamiento (modo privado, cuota llena): el carrito sigue en memoria
+    }
+  }
+
+  function guardarPendiente() {
+    if (temporizadorGuardado !== null) guardarCarrito();
+  }
+  window.addEventListener('pagehide', guardarPendiente);
+  document.addEventListener('visibilitychange', function() {
+    if (document.visibilityState === 'hidden') guardarPendiente();
+  });
+
+  // Lo guardado se rehace con los datos actuales del catálogo (nombre, precio y
+  // tallas del índice) y se suma a lo agregado mientras llegaba el índice; los
+  // productos que ya no están se descartan
+  function restaurarCarrito() {
+    const cambiado = cambiosSinGuardar || temporizadorGuardado !== null;
+    let guardado = [];
+    try {
+      guardado = JSON.parse(localStorage.getItem(CLAVE_ALMACEN) || '[]');
+    } catch (e) {
+      guardado = [];
+    }
+    if (!Array.isArray(guardado)) guardado = [];
+    const posiciones = new Map();
+    if (guardado.length) INDICE.nombres.forEach(function(nombre, i) { posiciones.set(nombre, i); });
+    guardado.forEach(function(a) {
+      if (!Array.isArray(a) || a.length !== 5 || !(a[4] > 0)) return;
+      const i = posiciones.get(normalizar(String(a[0])));
+      if (i === undefined) return;
+      const articulo = INDICE.articulos[i];
+      cambiarCantidad(claveArticulo(articulo[0], articulo[2]),
+                      { nombre: articulo[0], precio: articulo[1], precioNum: INDICE.precios[i], tallas: articulo[2] },
+                      Math.floor(a[4]));
+    });
+    if (carritoItems.size === 0) mostrarVacio();
+    carritoRestaurado = true;
+    // Restaurar no es un cambio: solo se guarda si antes se agregó algo
+    clearTimeout(temporizadorGuardado);
+    temporizadorGuardado = null;
+    if (cambiado) guardarCarrito();
+  }
+
+  function mostrarCarrito() {
+    carrito.classList.add('visible');
+    carrito.setAttribute('aria-hidden', 'false');
     // Si es móvil, mostrar versión compacta (bottom sheet)
-    if (window.innerWidth <= 768) {{
-      carrito.classList.add('visible');
+    if (window.innerWidth <= 768) {
       carrito.classList.add('compact');
-      carrito.setAttribute('aria-hidden', 'false');
-
       // desplazar la lista al final para ver el último item agregado
-      setTimeout(() => {{
+      setTimeout(() => {
         if (listaCarrito) listaCarrito.scrollTop = listaCarrito.scrollHeight;
-      }}, 120);
-    }} else {{
-      carrito.classList.add('visible');
-      carrito.setAttribute('aria-hidden', 'false');
-    }}
-  }};
+      }, 120);
+    }
+  }
+
+  // Un solo manejador para todos los botones "Agregar al carrito" (también los
+  // de las partes que se cargan después); los datos vienen en atributos data-*
+  catalogoEl.addEventListener('click', function(e) {
+    const boton = e.target.closest('[data-agregar]');
+    if (!boton) return;
+    const d = boton.dataset;
+    cambiarCantidad(claveArticulo(d.nombre, d.tallas),
+                    { nombre: d.nombre, precio: d.precio, precioNum: d.precioNum === '' ? null : Number(d.precioNum), tallas: d.tallas },
+                    1);
+    mostrarCarrito();
+  });
+
+  // Y otro para los botones de las filas del carrito
+  listaCarrito.addEventListener('click', function(e) {
+    const boton = e.target.closest('[data-accion]');
+    if (!boton) return;
+    const delta = { mas: 1, menos: -1, eliminar: -Infinity }[boton.dataset.accion];
+    cambiarCantidad(boton.closest('li').dataset.clave, null, delta);
+  });
 
   // Toggle carrito
-  toggleCarrito.addEventListener('click', () => {{
+  toggleCarrito.addEventListener('click', () => {
     carrito.classList.toggle('visible');
     carrito.setAttribute('aria-hidden', carrito.classList.contains('visible') ? 'false' : 'true');
-  }});
-  cerrarCarrito.addEventListener('click', () => {{
+  });
+  cerrarCarrito.addEventListener('click', () => {
     carrito.classList.remove('visible');
     carrito.setAttribute('aria-hidden', 'true');
-  }});
+  });
 
   // Inicial UI
-  actualizarUICarrito();
+  mostrarVacio();
+  actualizarResumen();
+
+  // Índice de búsqueda: activa los filtros y rehace el carrito guardado. Si no
+  // llega (sin red, o abriendo el archivo sin servidor) lo guardado queda intacto
+  fetch(CONFIG.busqueda).then(function(r) {
+    if (!r.ok) throw new Error('HTTP ' + r.status);
+    return r.json();
+  }).then(function(indice) {
+    usarIndice(indice);
+    restaurarCarrito();
+  }, function() {});
 
   // -----------------------------
   // Rellenar enlaces de redes sociales (se configuran desde Python)
   // -----------------------------
-  const socialFacebook = "{SOCIAL_LINKS.get('facebook','')}";
-  const socialInstagram = "{SOCIAL_LINKS.get('instagram','')}";
-  const socialTwitter = "{SOCIAL_LINKS.get('twitter','')}";
+  const socialFacebook = CONFIG.facebook;
+  const socialInstagram = CONFIG.instagram;
+  const socialTwitter = CONFIG.twitter;
 
   const elFb = document.getElementById('link-facebook');
   const elIg = document.getElementById('link-instagram');
@@ -482,34 +2042,987 @@ document.addEventListener('DOMContentLoaded', function() {{
   if (elIg && socialInstagram) elIg.href = socialInstagram;
   if (elTw && socialTwitter) elTw.href = socialTwitter;
 
-}});
-</script>
+});
+"""
+
+# Cabecera: <head> con estilos, header, panel del carrito y apertura del catálogo
+_PLANTILLA_CABECERA = Plantilla("""<!DOCTYPE html>
+<html lang="es">
+<head>
+<meta charset="UTF-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{{ tienda }}</title>
+<link rel="preconnect" href="https://fonts.gstatic.com" crossorigin>
+<link rel="preconnect" href="https://cdn.jsdelivr.net">
+<!-- Hojas de terceros sin bloquear el primer pintado -->
+<link rel="preload" as="style" href="https://fonts.googleapis.com/css2?family=Montserrat:wght@400;700;900&display=swap" onload="this.onload=null;this.rel='stylesheet'">
+<link rel="preload" as="style" href="https://cdn.jsdelivr.net/npm/swiper@11/swiper-bundle.min.css" onload="this.onload=null;this.rel='stylesheet'">
+<noscript>
+<link rel="stylesheet" href="https://fonts.googleapis.com/css2?family=Montserrat:wght@400;700;900&display=swap">
+<link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/swiper@11/swiper-bundle.min.css">
+</noscript>
+<style>{{ css }}</style>
+</head>
+<body>
+
+<header>
+  <div class="header-inner">
+    <h1>{{ tienda }}</h1>
+    <div class="header-right">
+      <!-- Redes sociales: los href se configuran desde JS -->
+      <div class="redes">
+        <a id="link-facebook" href="#" title="Facebook" target="_blank" rel="noopener noreferrer"><i class="fab fa-facebook-f"></i></a>
+        <a id="link-instagram" href="#" title="Instagram" target="_blank" rel="noopener noreferrer"><i class="fab fa-instagram"></i></a>
+        <a id="link-twitter" href="#" title="Twitter" target="_blank" rel="noopener noreferrer"><i class="fab fa-twitter"></i></a>
+      </div>
+
+      <!-- Botón carrito con badge -->
+      <div id="toggleCarrito" title="Ver carrito" aria-label="Ver carrito">
+        <span>🛒</span>
+        <span class="badge" id="cart-count">0</span>
+      </div>
+    </div>
+  </div>
+</header>
+
+<!-- Panel carrito -->
+<div id="carrito" aria-hidden="true">
+  <button id="cerrarCarrito" aria-label="Cerrar carrito">✖</button>
+  <h3>Carrito</h3>
+  <ul id="lista-carrito"></ul>
+  <div id="carrito-total" style="margin-top:12px;text-align:right;color:#ddd;font-weight:800;"></div>
+
+  <!-- Enlace WhatsApp: href se actualizará desde JS con el número y el mensaje -->
+  <a id="whatsapp" href="#" target="_blank" rel="noopener noreferrer" style="display:block;margin-top:12px;padding:12px;background:var(--accent);color:#fff;text-align:center;border-radius:8px;text-decoration:none;font-weight:800;">
+    Enviar pedido por WhatsApp
+  </a>
+</div>
+
+<!-- Búsqueda y filtros: consultan el índice de búsqueda (JSON aparte), no las tarjetas -->
+<div class="filtros" id="filtros" role="search">
+  <input id="filtro-texto" type="search" placeholder="Buscar modelo..." aria-label="Buscar modelo" autocomplete="off">
+  <select id="filtro-talla" aria-label="Talla"><option value="">Todas las tallas</option></select>
+  <input id="filtro-precio-min" type="number" inputmode="numeric" min="0" placeholder="Precio mín." aria-label="Precio mínimo">
+  <input id="filtro-precio-max" type="number" inputmode="numeric" min="0" placeholder="Precio máx." aria-label="Precio máximo">
+  <span id="filtro-resultados" aria-live="polite"></span>
+</div>
+
+<div class="catalogo" id="catalogo">
+""")
+
+
+# Pie: cierre del catálogo, configuración de la tienda y scripts diferidos
+_PLANTILLA_PIE = Plantilla("""
+</div>
+
+<script id="config-tienda" type="application/json">{{ config }}</script>
+<link rel="preload" href="{{ indice }}" as="fetch" type="application/json" crossorigin="anonymous">
+<script src="https://cdn.jsdelivr.net/npm/swiper@11/swiper-bundle.min.js" defer></script>
+<script src="{{ js }}" defer></script>
 
 </body>
 </html>
+""")
+
+def _minificar_css(css):
+    """Quita comentarios y espacios sobrantes del CSS (sin tocar los de calc, etc.)."""
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    css = re.sub(r":\s+", ":", css)
+    return css.replace(";}", "}").strip()
+
+def _minificar_js(js):
+    """
+    Minificado conservador: quita sangría, líneas vacías y los comentarios `//`
+    que ocupan una línea entera. No es un tokenizador: los comentarios al final
+    de una línea de código y los /* ... */ se quedan tal cual, así que en
+    _JS_CATALOGO los comentarios van siempre en su propia línea.
+    """
+    lineas = (linea.strip() for linea in js.splitlines())
+    return "\n".join(l for l in lineas if l and not l.startswith("//"))
+
+@functools.lru_cache(maxsize=None)
+def _assets():
+    """(CSS crítico minificado, JS minificado, ruta relativa del JS con hash de contenido)."""
+    css = _minificar_css(_CSS_CATALOGO + _CSS_ICONOS)
+    js = _minificar_js(_JS_CATALOGO)
+    huella = hashlib.sha256(js.encode("utf-8")).hexdigest()[:12]
+    return css, js, f"{ASSETS_DIR}/catalogo.{huella}.js"
+
+def _escribir_assets(carpeta_salida):
+    """Publica el JS con hash junto al HTML si aún no existe (nunca cambia de contenido)."""
+    _, js, ruta_js = _assets()
+    ruta = os.path.join(carpeta_salida, ruta_js)
+    if os.path.exists(ruta):
+        return False
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    _escribir_atomico(ruta, [js])
+    return True
+
+def _config_tienda(tienda, indice_busqueda=""):
+    """Configuración de la tienda para el JS, como JSON seguro dentro de <script>."""
+    return _json_en_script({
+        "tienda": tienda.nombre,
+        "busqueda": indice_busqueda,
+        "whatsapp": tienda.whatsapp,
+        "facebook": tienda.redes.get("facebook", ""),
+        "instagram": tienda.redes.get("instagram", ""),
+        "twitter": tienda.redes.get("twitter", ""),
+    })
+
+def _cabecera_html(tienda):
+    """<head> con estilos, header, panel del carrito y apertura del contenedor del catálogo."""
+    return _PLANTILLA_CABECERA.render(tienda=html.escape(tienda.nombre), css=_assets()[0])
+
+def _pie_html(tienda, indice_busqueda):
+    """Cierre del catálogo, configuración de la tienda (con el nombre del índice de búsqueda) y scripts diferidos."""
+    return _PLANTILLA_PIE.render(config=_config_tienda(tienda, indice_busqueda),
+                                 indice=html.escape(indice_busqueda), js=_assets()[2])
+
+# Estimación (no medida) del primer pintado con el perfil "3G lenta" de Chrome DevTools
+_3G_BYTES_POR_SEGUNDO = 50_000
+_3G_RTT = 0.4
+
+# Hojas de estilo de terceros que antes bloqueaban el pintado (bytes comprimidos, aprox.)
+_HOJAS_BLOQUEANTES_ORIGINALES = {
+    "Google Fonts": 1_000,
+    "Swiper": 3_500,
+    "Font Awesome (all.min.css)": 18_000,
+}
+
+def reporte_assets(tienda=None):
+    """
+    Bytes de CSS/JS antes y después de la etapa de assets y ahorro estimado del
+    primer pintado en 3G lenta: cada hoja bloqueante de otro origen cuesta unas
+    4 idas y vueltas (DNS, TCP, TLS y petición) más su descarga, y todo lo
+    incrustado se descarga con el HTML. Es un cálculo con las constantes
+    _3G_* y los tamaños fijos de _HOJAS_BLOQUEANTES_ORIGINALES, no una medición.
+    """
+    css, js, _ = _assets()
+    antes = (_CSS_CATALOGO + _JS_CATALOGO).encode("utf-8")
+    despues = (css + _config_tienda(tienda or Tienda())).encode("utf-8")
+    descarga = lambda n: n / _3G_BYTES_POR_SEGUNDO
+    bloqueo = max(4 * _3G_RTT + descarga(n) for n in _HOJAS_BLOQUEANTES_ORIGINALES.values())
+    fcp_antes = descarga(len(gzip.compress(antes))) + bloqueo
+    fcp_despues = descarga(len(gzip.compress(despues)))
+    return {
+        "incrustado_antes": len(antes),
+        "incrustado_despues": len(despues),
+        "incrustado_gzip_antes": len(gzip.compress(antes)),
+        "incrustado_gzip_despues": len(gzip.compress(despues)),
+        "js_externo": len(js.encode("utf-8")),
+        "hojas_bloqueantes_antes": len(_HOJAS_BLOQUEANTES_ORIGINALES),
+        "hojas_bloqueantes_despues": 0,
+        "fcp_3g_ahorro_estimado_s": round(fcp_antes - fcp_despues, 2),
+    }
+
+_CENTINELA_PARTES = """
+  <div id="catalogo-mas" data-indice="{indice}" style="width:100%;height:1px"></div>
 """
 
-    partes.append(html_footer)
-    html_final = "".join(partes)
+_SIN_COINCIDENCIAS = """
+  <div style="width:100%; text-align:center; padding:40px; color:#ddd;">
+    No se encontraron productos que coincidan con el Excel.
+  </div>
+"""
+
+def _tarjetas(productos, datos_excel, estado, tienda, tarjetas_previas=None, tarjetas=None, guardar_nuevas=True):
+    """
+    Genera el HTML de una tarjeta por cada producto del Excel, a medida que
+    llegan los productos.
+    En `estado` deja el número de productos, el hash de las entradas y el
+    reporte de coincidencias. Usa estado["indice"] (IndiceNombres) si ya viene
+    y, si un producto trae "coincidencia" (clave, puntuación), no lo vuelve a buscar.
+    Si se pasa `tarjetas` (dict), guarda ahí cada tarjeta usada y reutiliza las
+    de `tarjetas_previas`; sin `guardar_nuevas` solo guarda las reutilizadas (así
+    no crece la memoria con las recién renderizadas).
+    En estado["busqueda"] (una lista o, en modo streaming, _EntradasEnDisco) va,
+    por tarjeta, (nombre normalizado, precio numérico, tallas, (nombre, precio,
+    tallas)) para el índice de búsqueda.
+    Las coincidencias aproximadas solo se publican con PUBLICAR_APROXIMADAS y
+    contra filas libres; se guardan aparte y sus tarjetas salen al final.
+    """
+    hash_entradas = hashlib.sha256()
+    hash_entradas.update(_version_generador().encode("ascii"))
+    hash_entradas.update(_hash_json([tienda.nombre, tienda.redes, tienda.whatsapp, UMBRAL_SIMILITUD,
+                                     PUBLICAR_APROXIMADAS]).encode("ascii"))
+    for clave in sorted(datos_excel):
+        hash_entradas.update(json.dumps([clave, datos_excel[clave]], ensure_ascii=False).encode("utf-8"))
+    tarjetas_previas = tarjetas_previas or {}
+    inicio = time.perf_counter()
+    indice = estado.get("indice") or IndiceNombres(datos_excel)
+    segundos_busqueda = time.perf_counter() - inicio
+    usadas = set()
+    grupos_usados = set()
+    reporte = {"exactas": 0, "aproximadas": [], "productos_sin_excel": []}
+    busqueda = estado.setdefault("busqueda", [])
+    aplazadas = []
+    contador = 0
+
+    def tarjeta(nombre, nombre_norm, clave, imagenes, variantes):
+        nonlocal contador
+        usadas.add(clave)
+        grupos_usados.add(indice.representante[clave])
+        precio, tallas = datos_excel[clave]
+        if tarjetas is None:
+            bloque = _render_tarjeta(nombre, precio, tallas, imagenes, variantes)
+        else:
+            clave_tarjeta = _hash_json([nombre, precio, tallas, imagenes, variantes])
+            bloque = tarjetas.get(clave_tarjeta) or tarjetas_previas.get(clave_tarjeta)
+            if bloque is None:
+                bloque = _render_tarjeta(nombre, precio, tallas, imagenes, variantes)
+                if guardar_nuevas:
+                    tarjetas[clave_tarjeta] = bloque
+            else:
+                tarjetas[clave_tarjeta] = bloque
+        busqueda.append((nombre_norm, _precio_numerico(precio), _tallas_de_texto(tallas), (nombre, precio, tallas)))
+        bloque = bloque.replace(_MARCA_SWIPER, f"swiper-{contador}")
+        contador += 1
+        estado["productos"] = contador
+        return bloque
+
+    # Generar tarjetas solo para los modelos que están en el Excel (comparación
+    # normalizada; las aproximadas según UMBRAL_SIMILITUD y PUBLICAR_APROXIMADAS)
+    for prod in productos:
+        nombre = prod.get("nombre", "")
+        imagenes = prod.get("imagenes", [])
+        variantes = prod.get("variantes")
+        hash_entradas.update(_hash_json([nombre, imagenes, variantes]).encode("ascii"))
+        inicio = time.perf_counter()
+        nombre_norm = normalize_text(nombre)
+        clave, puntuacion = prod.get("coincidencia") or indice.buscar(nombre_norm)
+        segundos_busqueda += time.perf_counter() - inicio
+        if clave is None:
+            reporte["productos_sin_excel"].append(nombre)
+            continue
+        if puntuacion < 1.0:
+            entrada = {"producto": nombre, "excel": clave, "puntuacion": round(puntuacion, 3), "publicada": False}
+            reporte["aproximadas"].append(entrada)
+            if PUBLICAR_APROXIMADAS:
+                # Hasta el final no se sabe si la fila tiene también su producto exacto
+                aplazadas.append((entrada, nombre_norm, imagenes, variantes))
+            continue
+        if clave == nombre_norm:
+            reporte["exactas"] += 1
+        else:
+            reporte["aproximadas"].append({"producto": nombre, "excel": clave, "puntuacion": 1.0, "publicada": True})
+        yield tarjeta(nombre, nombre_norm, clave, imagenes, variantes)
+
+    for entrada, nombre_norm, imagenes, variantes in aplazadas:
+        if indice.representante[entrada["excel"]] in grupos_usados:
+            entrada["motivo"] = "la fila del Excel ya tiene producto"
+            continue
+        entrada["publicada"] = True
+        yield tarjeta(entrada["producto"], nombre_norm, entrada["excel"], imagenes, variantes)
+
+    estado["productos"] = contador
+    estado["segundos_coincidencias"] = segundos_busqueda
+    estado["entradas"] = hash_entradas.hexdigest()
+    # Filas sin producto propio: si otra fila de su mismo grupo canónico sí lo
+    # tiene, es un duplicado en el Excel, no un modelo que falte
+    grupos_usados = {indice.representante[c]: c for c in usadas}
+    reporte["excel_sin_producto"] = []
+    reporte["excel_duplicadas"] = []
+    for c in datos_excel:
+        if c in usadas:
+            continue
+        usada = grupos_usados.get(indice.representante[c])
+        if usada is None:
+            reporte["excel_sin_producto"].append(c)
+        else:
+            reporte["excel_duplicadas"].append({"excel": c, "igual_que": usada})
+    estado["reporte"] = reporte
+
+def _partes_html(productos, datos_excel, archivo_salida, estado, tienda, tarjetas_previas=None, tarjetas=None,
+                 guardar_nuevas=True):
+    """
+    Genera el HTML del catálogo completo trozo a trozo: cabecera, tarjetas y pie.
+    Antes del pie publica el índice de búsqueda (ver _escribir_indice_busqueda).
+    """
+    yield _cabecera_html(tienda)
+    yield from _tarjetas(productos, datos_excel, estado, tienda, tarjetas_previas, tarjetas, guardar_nuevas)
+    if estado["productos"] == 0:
+        yield _SIN_COINCIDENCIAS
+    estado["indice_busqueda"] = _escribir_indice_busqueda(archivo_salida, estado["busqueda"])
+    yield _pie_html(tienda, estado["indice_busqueda"])
+
+def _generar_por_partes(productos, datos_excel, archivo_salida, por_parte, estado, tienda,
+                        tarjetas_previas=None, tarjetas=None, guardar_nuevas=True):
+    """
+    Escribe el catálogo repartido en partes de `por_parte` productos: la primera
+    dentro del HTML principal y las demás como fragmentos aparte, más el índice
+    INDICE_PARTES. Solo se mantiene en memoria una parte a la vez (además de la
+    primera, porque el HTML principal lleva al final el nombre del índice de
+    búsqueda, que se conoce al terminar) y cada archivo se reescribe únicamente
+    si cambió. Todo se escribe primero en temporales y se publica junto al
+    terminar: si la generación falla a medias, el catálogo anterior queda
+    intacto (el índice de búsqueda nuevo lleva otro nombre y el viejo se borra
+    después de publicar).
+    Devuelve cuántos archivos se escribieron.
+    """
+    carpeta, nombre = os.path.split(archivo_salida)
+    base = os.path.splitext(nombre)[0]
+    publicacion = _Publicacion()
+    try:
+        grupos = _agrupar(_tarjetas(productos, datos_excel, estado, tienda, tarjetas_previas, tarjetas,
+                                    guardar_nuevas), por_parte)
+        primera = next(grupos, [])
+        segunda = next(grupos, None)
+
+        principal = [_cabecera_html(tienda)] + primera
+        if not primera:
+            principal.append(_SIN_COINCIDENCIAS)
+        if segunda is not None:
+            principal.append(_CENTINELA_PARTES.format(indice=html.escape(INDICE_PARTES)))
+        principal = "".join(principal)
+        partes = [{"archivo": nombre, "productos": len(primera)}]
+        del primera
+        tamano = 0
+
+        if segunda is not None:
+            for grupo in itertools.chain([segunda], grupos):
+                nombre_parte = f"{base}-parte-{len(partes):04d}.html"
+                texto = "".join(grupo)
+                tamano += len(texto.encode("utf-8"))
+                publicacion.preparar(os.path.join(carpeta, nombre_parte), texto)
+                partes.append({"archivo": nombre_parte, "productos": len(grupo)})
+        nombre_indice = estado["indice_busqueda"] = _escribir_indice_busqueda(archivo_salida, estado["busqueda"])
+        principal += _pie_html(tienda, nombre_indice)
+        tamano += len(principal.encode("utf-8"))
+        publicacion.preparar(archivo_salida, principal)
+        del principal
+        indice = {"total": estado["productos"], "por_parte": por_parte, "partes": partes,
+                  "busqueda": nombre_indice}
+        publicacion.preparar(os.path.join(carpeta, INDICE_PARTES),
+                             json.dumps(indice, ensure_ascii=False, separators=(",", ":")))
+    except BaseException:
+        publicacion.descartar()
+        raise
+    escritos = publicacion.publicar()
+
+    # Borrar partes sobrantes de una generación anterior más grande y el índice de búsqueda anterior
+    escritos += _borrar_partes(carpeta, base, {p["archivo"] for p in partes})
+    escritos += _borrar_indices_busqueda(carpeta, base, nombre_indice)
+    estado["bytes_salida"] = tamano
+    return escritos
+
+def _borrar_partes(carpeta, base, actuales=()):
+    """Borra los "<base>-parte-NNNN.html" de `carpeta` que no estén en `actuales`; devuelve cuántos."""
+    patron = re.compile(re.escape(base) + r"-parte-\d{4}\.html")
+    borrados = 0
+    for nombre in os.listdir(carpeta or "."):
+        if patron.fullmatch(nombre) and nombre not in actuales:
+            os.remove(os.path.join(carpeta, nombre))
+            borrados += 1
+    return borrados
+
+def _quitar_por_partes(archivo_salida):
+    """
+    Al volver a un único HTML borra las partes de `archivo_salida` y el
+    INDICE_PARTES si es el suyo (otro catálogo de la carpeta puede usarlo).
+    """
+    carpeta, nombre = os.path.split(archivo_salida)
+    _borrar_partes(carpeta, os.path.splitext(nombre)[0])
+    ruta_indice = os.path.join(carpeta, INDICE_PARTES)
+    try:
+        with open(ruta_indice, encoding="utf-8") as f:
+            propio = json.load(f)["partes"][0]["archivo"] == nombre
+    except (OSError, ValueError, KeyError, IndexError, TypeError):
+        return
+    if propio:
+        os.remove(ruta_indice)
+
+def _agrupar(iterable, tamano):
+    """Entrega listas de hasta `tamano` elementos consecutivos."""
+    iterador = iter(iterable)
+    while True:
+        grupo = list(itertools.islice(iterador, tamano))
+        if not grupo:
+            return
+        yield grupo
+
+# umask del proceso (solo se puede leer cambiándola, así que se lee una vez al importar)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+def _escribir_atomico(ruta, partes, salida_previa=None):
+    """
+    Escribe los trozos de texto en un temporal de la misma carpeta (con buffer)
+    y lo renombra sobre `ruta`, así nunca se ve un archivo a medio escribir.
+    Si el resultado coincide con `salida_previa` (sha256) y el archivo existe,
+    descarta el temporal. Devuelve (sha256, bytes, escrito).
+    """
+    carpeta, nombre = os.path.split(ruta)
+    fd, temporal = tempfile.mkstemp(prefix=f".{nombre}.", suffix=".tmp", dir=carpeta or ".")
+    h = hashlib.sha256()
+    total = 0
+    try:
+        with os.fdopen(fd, "wb", buffering=1 << 16) as f:
+            for parte in partes:
+                datos = parte.encode("utf-8")
+                h.update(datos)
+                f.write(datos)
+                total += len(datos)
+        huella = h.hexdigest()
+        if huella == salida_previa and os.path.exists(ruta) and os.path.getsize(ruta) == total:
+            os.remove(temporal)
+            return huella, total, False
+        _reemplazar(temporal, ruta)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+    return huella, total, True
+
+def _reemplazar(temporal, ruta):
+    """Renombra `temporal` sobre `ruta` con el modo que tendría un archivo escrito con open()."""
+    # mkstemp crea el temporal con 0600: se deja el modo del archivo que se
+    # reemplaza o, si es nuevo, el que daría open() con la umask del proceso
+    try:
+        modo = stat.S_IMODE(os.stat(ruta).st_mode)
+    except FileNotFoundError:
+        modo = 0o666 & ~_UMASK
+    os.chmod(temporal, modo)
+    os.replace(temporal, ruta)
+
+def _igual_que(ruta, texto):
+    """Indica si `ruta` ya contiene exactamente `texto`."""
+    try:
+        with open(ruta, encoding="utf-8") as f:
+            return f.read() == texto
+    except OSError:
+        return False
+
+def _escribir_si_cambia(ruta, texto):
+    """Escribe `texto` (atómicamente) solo si difiere del contenido actual de `ruta`."""
+    if _igual_que(ruta, texto):
+        return False
+    _escribir_atomico(ruta, [texto])
+    return True
+
+class _Publicacion:
+    """
+    Varios archivos que se publican juntos: `preparar` deja cada texto en un
+    temporal junto a su destino (si cambió) y `publicar` los renombra todos al
+    final. Si algo falla antes, `descartar` borra los temporales y los archivos
+    anteriores quedan intactos.
+    """
 
-    # Escribir archivo
-    with open(archivo_salida, "w", encoding="utf-8") as f:
-        f.write(html_final)
+    def __init__(self):
+        self.pendientes = []
 
-    print(f"Archivo generado: {archivo_salida} ({contador} productos)")
+    def preparar(self, ruta, texto):
+        if _igual_que(ruta, texto):
+            return
+        carpeta, nombre = os.path.split(ruta)
+        fd, temporal = tempfile.mkstemp(prefix=f".{nombre}.", suffix=".tmp", dir=carpeta or ".")
+        self.pendientes.append((temporal, ruta))
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            f.write(texto)
+
+    def publicar(self):
+        """Renombra los temporales sobre sus destinos; devuelve cuántos archivos cambiaron."""
+        for temporal, ruta in self.pendientes:
+            _reemplazar(temporal, ruta)
+        publicados = len(self.pendientes)
+        self.pendientes = []
+        return publicados
+
+    def descartar(self):
+        for temporal, _ in self.pendientes:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+        self.pendientes = []
+
+def _registrar_metricas(estado, tamano, escrito):
+    """Pasa a METRICAS lo que dejó la generación en `estado` (coincidencias y salida)."""
+    reporte = estado["reporte"]
+    METRICAS.aparte("coincidencias", estado["segundos_coincidencias"])
+    METRICAS.fijar("coincidencias", exactas=reporte["exactas"], aproximadas=len(reporte["aproximadas"]),
+                   aproximadas_sin_publicar=sum(not a["publicada"] for a in reporte["aproximadas"]),
+                   productos_sin_excel=len(reporte["productos_sin_excel"]),
+                   excel_sin_producto=len(reporte["excel_sin_producto"]),
+                   excel_duplicadas=len(reporte["excel_duplicadas"]))
+    METRICAS.fijar("html", productos=estado["productos"], bytes_salida=tamano, escrito=escrito)
+
+def generar_html(productos, datos_excel, archivo=OUTPUT_HTML, incremental=True, streaming=STREAMING_HTML,
+                 por_parte=PRODUCTOS_POR_PARTE, tienda=None, indice=None):
+    """
+    Genera el catálogo con los productos que aparecen en el Excel.
+    En modo incremental se apoya en el manifiesto de `archivo` (MANIFIESTO):
+    reutiliza las tarjetas ya renderizadas y, si las entradas (productos, Excel y
+    configuración) o el HTML resultante no cambiaron, no escribe nada en disco.
+    Con `streaming` cada trozo se escribe directamente en el archivo temporal a
+    medida que llegan los productos, con memoria constante sea cual sea el tamaño
+    del catálogo: reutiliza las tarjetas del manifiesto, pero solo conserva en él
+    las que ya estaban (no acumula las nuevas) y compara únicamente el resultado.
+    Con `por_parte` > 0 el catálogo se reparte en varios archivos (ver
+    PRODUCTOS_POR_PARTE).
+    `tienda` (ver Tienda) da nombre, WhatsApp y redes; por defecto, las constantes.
+    `indice` es el IndiceNombres de `datos_excel`, si ya se construyó antes.
+    La escritura siempre es atómica (temporal + rename).
+    """
+    tienda = tienda or Tienda()
+    ruta_actual = os.path.dirname(os.path.abspath(__file__))
+    archivo_salida = os.path.join(ruta_actual, archivo)
+    ruta_manifiesto = ruta_propia_de_salida(MANIFIESTO, archivo, oculto=True)
+    _escribir_assets(os.path.dirname(archivo_salida))
+
+    version = _version_generador()
+    manifiesto = _leer_manifiesto(ruta_manifiesto) if incremental else {}
+    if manifiesto.get("version") != version:
+        manifiesto = {}
+    # En streaming las entradas del índice de búsqueda esperan en disco, no en memoria
+    estado = {"indice": indice, "busqueda": _EntradasEnDisco() if streaming else []}
+    tarjetas = {}
+
+    if por_parte <= 0:
+        _quitar_por_partes(archivo_salida)
+    if por_parte > 0:
+        escrito = _generar_por_partes(productos, datos_excel, archivo_salida, por_parte, estado, tienda,
+                                      manifiesto.get("tarjetas"), tarjetas, not streaming) > 0
+        huella_salida = tamano = None
+    elif streaming:
+        huella_salida, tamano, escrito = _escribir_atomico(
+            archivo_salida, _partes_html(productos, datos_excel, archivo_salida, estado, tienda,
+                                         manifiesto.get("tarjetas"), tarjetas, guardar_nuevas=False),
+            manifiesto.get("salida"))
+    else:
+        partes = list(_partes_html(productos, datos_excel, archivo_salida, estado, tienda, manifiesto.get("tarjetas"),
+                                   tarjetas))
+        if (incremental and manifiesto.get("entradas") == estado["entradas"]
+                and os.path.exists(archivo_salida)
+                and os.path.getsize(archivo_salida) == manifiesto.get("tamano")):
+            print(f"Sin cambios: {archivo_salida} ({estado['productos']} productos)")
+            _registrar_metricas(estado, manifiesto["tamano"], False)
+            return
+        html_final = "".join(partes)
+        contenido = html_final.encode("utf-8")
+        huella_salida = hashlib.sha256(contenido).hexdigest()
+        tamano = len(contenido)
+        escrito = not (incremental and manifiesto.get("salida") == huella_salida
+                       and os.path.exists(archivo_salida)
+                       and os.path.getsize(archivo_salida) == tamano)
+        if escrito:
+            _escribir_atomico(archivo_salida, [html_final])
+    if streaming:
+        estado["busqueda"].close()
+    if por_parte <= 0:
+        carpeta, nombre = os.path.split(archivo_salida)
+        _borrar_indices_busqueda(carpeta, os.path.splitext(nombre)[0], estado["indice_busqueda"])
+
+    _registrar_metricas(estado, estado.get("bytes_salida", tamano), escrito)
+    if escrito:
+        print(f"Archivo generado: {archivo_salida} ({estado['productos']} productos)")
+        r = reporte_assets(tienda)
+        print(f"Assets: CSS/JS incrustado {r['incrustado_antes']} -> {r['incrustado_despues']} bytes "
+              f"(gzip {r['incrustado_gzip_antes']} -> {r['incrustado_gzip_despues']}), "
+              f"JS externo cacheable {r['js_externo']} bytes, hojas bloqueantes "
+              f"{r['hojas_bloqueantes_antes']} -> {r['hojas_bloqueantes_despues']}, "
+              f"primer pintado en 3G lenta ~{r['fcp_3g_ahorro_estimado_s']} s antes "
+              f"(estimación con tamaños fijos, no medida)")
+    else:
+        print(f"Sin cambios en el HTML: {archivo_salida} ({estado['productos']} productos)")
+
+    reporte = estado["reporte"]
+    ruta_reporte = ruta_propia_de_salida(REPORTE_COINCIDENCIAS, archivo)
+    _escribir_si_cambia(ruta_reporte, json.dumps(reporte, ensure_ascii=False, indent=2))
+    sin_publicar = sum(not a["publicada"] for a in reporte["aproximadas"])
+    print(f"Coincidencias: {reporte['exactas']} exactas, {len(reporte['aproximadas'])} aproximadas "
+          f"({sin_publicar} sin publicar), "
+          f"{len(reporte['productos_sin_excel'])} productos sin Excel, "
+          f"{len(reporte['excel_sin_producto'])} filas del Excel sin producto, "
+          f"{len(reporte['excel_duplicadas'])} filas repetidas ({ruta_reporte})")
+
+    # Si el HTML no cambió, el manifiesto anterior sigue sirviendo: no se toca el disco
+    if incremental and (escrito or not manifiesto):
+        _escribir_si_cambia(ruta_manifiesto, json.dumps({
+            "version": version,
+            "entradas": estado["entradas"],
+            "salida": huella_salida,
+            "tamano": tamano,
+            "tarjetas": tarjetas,
+        }, ensure_ascii=False))
+
+def construir(productos, datos_excel, tienda=None, streaming=STREAMING_HTML):
+    """Espeja las imágenes (si IMAGENES_LOCALES) y genera el catálogo de `tienda` (ver generar_html).
+
+    Cada producto se busca una sola vez en el Excel; la coincidencia sirve
+    tanto para decidir qué imágenes espejar como para armar las tarjetas.
+    """
+    tienda = tienda or Tienda()
+    indice = IndiceNombres(datos_excel)
+    if IMAGENES_LOCALES:
+        productos = METRICAS.medir_generador("imagenes", espejar_imagenes(
+            _con_coincidencia(productos, indice), ruta_junto_a_salida(IMAGENES_DIR, tienda.archivo),
+            aceptar=lambda p: _publicable(p["coincidencia"])))
+    with METRICAS.medir("html"):
+        generar_html(productos, datos_excel, archivo=tienda.archivo, streaming=streaming,
+                     tienda=tienda, indice=indice)
+
+def _publicable(coincidencia):
+    """Indica si una coincidencia (clave, puntuación) puede llegar a tener tarjeta."""
+    clave, puntuacion = coincidencia
+    return clave is not None and (puntuacion >= 1.0 or PUBLICAR_APROXIMADAS)
+
+def _con_coincidencia(productos, indice):
+    """Anota en cada producto su "coincidencia" (clave del Excel, puntuación)."""
+    for prod in productos:
+        prod["coincidencia"] = indice.buscar(normalize_text(prod.get("nombre", "")))
+        yield prod
+
+def escribir_metricas(archivo=OUTPUT_HTML, prometheus=METRICAS_PROMETHEUS):
+    """
+    Guarda las métricas en METRICAS_JSON si la generación escribió el catálogo
+    (y siempre en `prometheus`, si se indica) e imprime su resumen.
+    """
+    informe = METRICAS.informe()
+    if informe["etapas"].get("html", {}).get("escrito"):
+        _escribir_atomico(ruta_junto_a_salida(METRICAS_JSON, archivo),
+                          [json.dumps(informe, ensure_ascii=False, indent=2)])
+    if prometheus:
+        try:
+            _escribir_atomico(prometheus, [METRICAS.prometheus(informe)])
+        except OSError as e:
+            print(f"No se pudieron escribir las métricas de Prometheus en {prometheus}:", e)
+    print(METRICAS.resumen(informe))
+
+def _firma_archivo(ruta):
+    """(mtime en ns, tamaño) de `ruta`, o None si no existe."""
+    try:
+        st = os.stat(ruta)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+def _esperar_quieto(ruta, firma, espera):
+    """Espera a que `ruta` pase `espera` segundos sin cambiar y devuelve su firma final."""
+    while True:
+        time.sleep(espera)
+        actual = _firma_archivo(ruta)
+        if actual == firma:
+            return firma
+        firma = actual
+
+def vigilar(tienda, cache, intervalo_excel=VIGILAR_INTERVALO_EXCEL,
+            espera=VIGILAR_ESPERA, intervalo_fuente=VIGILAR_INTERVALO_FUENTE, prometheus=METRICAS_PROMETHEUS,
+            streaming=STREAMING_HTML):
+    """
+    Modo --watch: el proceso queda en marcha (con pandas y requests ya cargados)
+    y regenera el catálogo de `tienda` cuando cambia su Excel o sus fuentes de productos.
+    El Excel se vigila por sondeo de su fecha y tamaño cada `intervalo_excel`
+    segundos, con `espera` de margen para agrupar ráfagas de escrituras; la
+    fuente se consulta cada `intervalo_fuente` segundos a través de `cache`.
+    Los productos se guardan en memoria, así que un cambio en el Excel no
+    toca la red, y el manifiesto evita volver a renderizar las tarjetas que
+    no cambiaron. Si el Excel falta o no se puede leer, se siguen usando sus
+    últimos datos válidos (y sin ninguno no se genera nada). Tras cada
+    regeneración se escriben sus métricas. Termina con Ctrl+C.
+    """
+    productos = huella_productos = None
+    datos_excel = {}
+    firma_excel = None
+    proxima_fuente = 0.0
+    ruta_excel = tienda.excel
+    print(f"Vigilando {ruta_excel} y {len(tienda.urls)} fuente(s) de productos (Ctrl+C para salir)")
+    while True:
+        METRICAS.reiniciar()
+        cambio = False
+        if time.monotonic() >= proxima_fuente:
+            proxima_fuente = time.monotonic() + intervalo_fuente
+            try:
+                with METRICAS.medir("descarga"):
+                    nuevos = list(extraer_productos(tienda.urls, cache=cache))
+            except RuntimeError as e:
+                print(f"{e}; se mantienen los productos anteriores.")
+            else:
+                huella = _hash_json(nuevos)
+                if huella != huella_productos:
+                    productos, huella_productos, cambio = nuevos, huella, True
+
+        firma = _firma_archivo(ruta_excel)
+        if firma != firma_excel:
+            firma_excel = _esperar_quieto(ruta_excel, firma, espera)
+            try:
+                with METRICAS.medir("excel"):
+                    nuevos_datos = leer_excel(ruta_excel)
+            except Exception as e:
+                # Archivo a medio guardar o inválido: se reintenta en el próximo cambio
+                print("No se pudo leer el Excel; se mantienen los datos anteriores:", e)
+            else:
+                if nuevos_datos:
+                    datos_excel, cambio = nuevos_datos, True
+                else:
+                    # Borrado, vacío o a medio reescribir: no se publica un catálogo vacío
+                    print("El Excel no tiene filas válidas; se mantienen los datos anteriores.")
+
+        if cambio and productos is not None and datos_excel:
+            inicio = time.perf_counter()
+            construir(productos, datos_excel, tienda, streaming)
+            print(f"Catálogo actualizado en {time.perf_counter() - inicio:.2f} s")
+            escribir_metricas(tienda.archivo, prometheus)
+        time.sleep(intervalo_excel)
+
+# -------------------------
+# Varias tiendas
+# -------------------------
+
+# Claves admitidas para cada tienda (y en [comun]) del archivo de configuración
+_CLAVES_TIENDA = {"nombre", "whatsapp", "redes", "urls", "excel", "salida", "archivo"}
+
+def _cargar_config(ruta):
+    """Lee el archivo de configuración según su extensión (.toml, .json, .yaml/.yml)."""
+    extension = os.path.splitext(ruta)[1].lower()
+    if extension == ".toml":
+        try:
+            import tomllib
+        except ImportError:  # Python < 3.11
+            try:
+                import tomli as tomllib
+            except ImportError:
+                raise ValueError(f"Para leer {ruta} hace falta Python 3.11 o tomli (pip install tomli)") from None
+        with open(ruta, "rb") as f:
+            return tomllib.load(f)
+    if extension in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError(f"Para leer {ruta} hace falta PyYAML (pip install pyyaml)") from None
+        with open(ruta, encoding="utf-8") as f:
+            return yaml.safe_load(f)
+    if extension == ".json":
+        with open(ruta, encoding="utf-8") as f:
+            return json.load(f)
+    raise ValueError(f"Formato de configuración no soportado: {ruta} (usa .toml, .json o .yaml)")
+
+def leer_config_tiendas(ruta):
+    """
+    Lee la configuración de varias tiendas y devuelve una lista de Tienda.
+    El archivo tiene una lista "tiendas" (nombre, whatsapp, redes, urls, excel,
+    salida, archivo) y opcionalmente una sección "comun" con valores por defecto.
+    Las rutas son relativas al archivo de configuración; cada tienda escribe en
+    su carpeta `salida` (por defecto, su nombre normalizado). Si la configuración
+    no es válida lanza ValueError.
+    """
+    datos = _cargar_config(ruta)
+    if not isinstance(datos, dict) or not isinstance(datos.get("tiendas"), list) or not datos["tiendas"]:
+        raise ValueError(f"{ruta}: falta la lista de tiendas")
+    comun = datos.get("comun") or {}
+    raiz = os.path.dirname(os.path.abspath(ruta))
+    tiendas = []
+    archivos = set()
+    for i, entrada in enumerate(datos["tiendas"], 1):
+        if not isinstance(entrada, dict):
+            raise ValueError(f"{ruta}: la tienda {i} no es una tabla de claves")
+        config = {**comun, **entrada}
+        desconocidas = set(config) - _CLAVES_TIENDA
+        if desconocidas:
+            raise ValueError(f"{ruta}: claves desconocidas en la tienda {i}: {', '.join(sorted(desconocidas))}")
+        if not config.get("nombre"):
+            raise ValueError(f"{ruta}: la tienda {i} no tiene nombre")
+        urls = config.get("urls", URLS)
+        if isinstance(urls, str):
+            urls = [urls]
+        salida = config.get("salida") or re.sub(r"[^a-z0-9]+", "-", normalize_text(config["nombre"])).strip("-")
+        archivo = os.path.normpath(os.path.join(raiz, salida or f"tienda-{i}", config.get("archivo", OUTPUT_HTML)))
+        if archivo in archivos:
+            raise ValueError(f"{ruta}: la tienda {i} escribe en el mismo archivo que otra ({archivo})")
+        archivos.add(archivo)
+        tiendas.append(Tienda(nombre=config["nombre"], whatsapp=config.get("whatsapp"), redes=config.get("redes"),
+                              urls=urls, excel=os.path.join(raiz, config.get("excel", EXCEL_FILENAME)),
+                              archivo=archivo))
+    return tiendas
+
+# Datos comunes a todas las tiendas en los procesos de construir_tiendas (los fija _iniciar_trabajador)
+_COMPARTIDO = {}
+
+def _iniciar_trabajador(fuentes, excels, carpeta_imagenes):
+    _COMPARTIDO.update(fuentes=fuentes, excels=excels, carpeta_imagenes=carpeta_imagenes)
+
+def _productos_tienda(tienda):
+    """
+    Productos de las fuentes de `tienda`, en el orden de sus URLs y sin duplicados,
+    con las rutas de las imágenes locales relativas a la carpeta de su HTML.
+    """
+    relativa = os.path.relpath(_COMPARTIDO["carpeta_imagenes"], os.path.dirname(tienda.archivo))
+    relativa = relativa.replace(os.sep, "/")
+    vistos_handle = set()
+    vistos_nombre = set()
+    for url in tienda.urls:
+        for prod in _COMPARTIDO["fuentes"].get(url) or ():
+            if not _nuevo_producto(prod, vistos_handle, vistos_nombre):
+                continue
+            if prod.get("variantes"):
+                prod = dict(prod, variantes=[
+                    [(f"{relativa}/{ruta.rsplit('/', 1)[-1]}", ancho) for ruta, ancho in variantes]
+                    if variantes else variantes
+                    for variantes in prod["variantes"]])
+            yield prod
+
+def _construir_tienda(tienda, streaming=STREAMING_HTML):
+    """Genera el catálogo de una tienda en un proceso del pool y devuelve su resumen (con lo impreso)."""
+    inicio = time.perf_counter()
+    resumen = {"tienda": tienda.nombre, "archivo": tienda.archivo}
+    salida = io.StringIO()
+    with contextlib.redirect_stdout(salida):
+        METRICAS.reiniciar()
+        try:
+            caidas = [url for url in tienda.urls if _COMPARTIDO["fuentes"].get(url) is None]
+            if caidas:
+                # Igual que con una sola tienda: sin una de sus fuentes el catálogo quedaría incompleto
+                raise RuntimeError(f"No se pudo descargar {', '.join(caidas)}")
+            os.makedirs(os.path.dirname(tienda.archivo), exist_ok=True)
+            with METRICAS.medir("html"):
+                generar_html(_productos_tienda(tienda), _COMPARTIDO["excels"][tienda.excel],
+                             archivo=tienda.archivo, streaming=streaming, tienda=tienda)
+            escribir_metricas(tienda.archivo)
+            html_ = METRICAS.informe()["etapas"]["html"]
+            resumen.update(productos=html_.get("productos"), escrito=html_.get("escrito"),
+                           bytes_salida=html_.get("bytes_salida"))
+        except Exception as e:
+            # Una tienda con problemas no detiene a las demás
+            print(f"{e}; se conserva el catálogo anterior.")
+            resumen["error"] = str(e)
+    resumen["segundos"] = round(time.perf_counter() - inicio, 4)
+    resumen["salida"] = salida.getvalue()
+    return resumen
+
+def construir_tiendas(tiendas, procesos=PROCESOS_TIENDAS, raiz=None, streaming=STREAMING_HTML):
+    """
+    Genera varias tiendas en una sola ejecución. Lo caro se hace una vez para
+    todas: cada fuente de productos se descarga una sola vez (en paralelo y a
+    través de la caché HTTP), cada Excel se lee una vez y las imágenes se espejan
+    en una carpeta común (IMAGENES_DIR en `raiz`). Después las tiendas se
+    renderizan en un pool de `procesos` procesos, cada una en su carpeta y con
+    su manifiesto, métricas y reporte de coincidencias.
+    Imprime un resumen, lo guarda en RESUMEN_TIENDAS (en `raiz`) y lo devuelve.
+    """
+    # Solo este modo usa procesos: multiprocessing no se importa en cada arranque
+    from concurrent.futures import ProcessPoolExecutor
+
+    raiz = raiz or os.path.dirname(os.path.abspath(__file__))
+    METRICAS.reiniciar()
+    inicio = time.perf_counter()
+    cache = CacheHTTP(os.path.join(raiz, CACHE_HTTP_DIR))
+    urls = list(dict.fromkeys(url for tienda in tiendas for url in tienda.urls))
+
+    def descargar(url):
+        try:
+            return list(extraer_productos(url, cache=cache))
+        except RuntimeError as e:
+            print(f"{e} ({url})")
+            return None
+
+    with METRICAS.medir("descarga"), ThreadPoolExecutor(max_workers=max(1, len(urls))) as pool:
+        fuentes = dict(zip(urls, pool.map(descargar, urls)))
+    with METRICAS.medir("excel"):
+        excels = {ruta: leer_excel(ruta) for ruta in dict.fromkeys(tienda.excel for tienda in tiendas)}
+
+    carpeta_imagenes = os.path.join(raiz, IMAGENES_DIR)
+    if IMAGENES_LOCALES:
+        indices = {ruta: IndiceNombres(datos) for ruta, datos in excels.items()}
+        for url, productos in fuentes.items():
+            if not productos:
+                continue
+            # Solo las imágenes de productos que alguna tienda con esta fuente va a mostrar
+            propios = [indices[ruta] for ruta in dict.fromkeys(t.excel for t in tiendas if url in t.urls)]
+
+            def aceptar(p):
+                nombre_norm = normalize_text(p.get("nombre", ""))
+                return any(_publicable(indice.buscar(nombre_norm)) for indice in propios)
+
+            fuentes[url] = list(METRICAS.medir_generador(
+                "imagenes", espejar_imagenes(productos, carpeta_imagenes, aceptar=aceptar)))
+
+    procesos = procesos or os.cpu_count() or 1
+    procesos = min(procesos, len(tiendas))
+    resumenes = []
+    with METRICAS.medir("tiendas"), ProcessPoolExecutor(
+            max_workers=procesos, initializer=_iniciar_trabajador,
+            initargs=(fuentes, excels, carpeta_imagenes)) as pool:
+        for resumen in pool.map(functools.partial(_construir_tienda, streaming=streaming), tiendas):
+            print(f"[{resumen['tienda']}]")
+            print(resumen.pop("salida"), end="")
+            resumenes.append(resumen)
+
+    informe = METRICAS.informe()
+    print(f"Resumen de {len(tiendas)} tiendas ({procesos} procesos):")
+    for r in resumenes:
+        if "error" in r:
+            estado = f"error: {r['error']}"
+        else:
+            estado = f"{r['productos']} productos, {'generado' if r['escrito'] else 'sin cambios'}"
+        print(f"  {r['tienda']}: {estado}, {r['segundos']:.2f} s -> {r['archivo']}")
+    print(f"Total {time.perf_counter() - inicio:.2f} s; " + METRICAS.resumen(informe))
+    _escribir_atomico(os.path.join(raiz, RESUMEN_TIENDAS), [json.dumps(
+        {"comun": informe, "procesos": procesos, "tiendas": resumenes}, ensure_ascii=False, indent=2)])
+    return resumenes
 
 # -------------------------
 # Bloque principal
 # -------------------------
 
 if __name__ == "__main__":
-    try:
-        productos = extraer_productos(URL)
-    except Exception as e:
-        print("Error al descargar productos:", e)
-        productos = []
+    parser = argparse.ArgumentParser(description="Genera el catálogo HTML de la tienda.")
+    parser.add_argument("--watch", action="store_true",
+                        help="seguir en marcha y regenerar al cambiar el Excel o la fuente")
+    parser.add_argument("--intervalo-fuente", type=float, default=VIGILAR_INTERVALO_FUENTE,
+                        help="segundos entre consultas a la fuente en modo --watch (por defecto %(default)s)")
+    parser.add_argument("--metricas-prometheus", metavar="RUTA", default=METRICAS_PROMETHEUS,
+                        help="escribir también las métricas en RUTA (textfile collector de Prometheus)")
+    parser.add_argument("--profile", metavar="RUTA",
+                        help="perfilar la ejecución con cProfile y guardar las estadísticas (pstats) en RUTA")
+    parser.add_argument("--streaming", action="store_true", default=STREAMING_HTML,
+                        help="escribir el HTML a medida que llegan los productos, con memoria constante")
+    parser.add_argument("--imagenes-locales", action="store_true", default=IMAGENES_LOCALES,
+                        help=f"copiar las imágenes en {IMAGENES_DIR}/ como WebP de varios anchos (requiere Pillow)")
+    parser.add_argument("--tiendas", metavar="RUTA",
+                        help="generar varias tiendas descritas en RUTA (.toml, .json o .yaml)")
+    parser.add_argument("--procesos", type=int, default=PROCESOS_TIENDAS,
+                        help="procesos que renderizan tiendas a la vez con --tiendas (0 = uno por CPU)")
+    args = parser.parse_args()
+    if args.tiendas and args.watch:
+        parser.error("--tiendas no se puede combinar con --watch")
+    IMAGENES_LOCALES = args.imagenes_locales
+
+    perfil = None
+    if args.profile:
+        import cProfile
+        perfil = cProfile.Profile()
+        perfil.enable()
 
-    ruta_excel = os.path.join(os.path.dirname(os.path.abspath(__file__)), EXCEL_FILENAME)
-    datos_excel = leer_excel(ruta_excel)
+    # Sin --tiendas, la tienda de las constantes del principio del archivo
+    tienda = Tienda()
 
-    generar_html(productos, datos_excel, archivo=OUTPUT_HTML)
+    try:
+        if args.tiendas:
+            try:
+                tiendas = leer_config_tiendas(args.tiendas)
+            except (OSError, ValueError) as e:
+                parser.error(str(e))
+            construir_tiendas(tiendas, args.procesos, os.path.dirname(os.path.abspath(args.tiendas)),
+                              streaming=args.streaming)
+        elif args.watch:
+            # Cada consulta revalida con el servidor (304 si no hay cambios)
+            cache = CacheHTTP(ruta_junto_a_salida(CACHE_HTTP_DIR, tienda.archivo), ttl=0)
+            try:
+                vigilar(tienda, cache, intervalo_fuente=args.intervalo_fuente,
+                        prometheus=args.metricas_prometheus, streaming=args.streaming)
+            except KeyboardInterrupt:
+                print("Vigilancia detenida.")
+        else:
+            cache = CacheHTTP(ruta_junto_a_salida(CACHE_HTTP_DIR, tienda.archivo))
+            productos = METRICAS.medir_generador("descarga", extraer_productos(tienda.urls, cache=cache))
+            with METRICAS.medir("excel"):
+                datos_excel = leer_excel(tienda.excel)
+            try:
+                construir(productos, datos_excel, tienda, streaming=args.streaming)
+            except RuntimeError as e:
+                print(f"{e}; se conserva el catálogo anterior.")
+            escribir_metricas(tienda.archivo, prometheus=args.metricas_prometheus)
+    finally:
+        if perfil is not None:
+            perfil.disable()
+            perfil.dump_stats(args.profile)
+            print(f"Perfil guardado en {args.profile} (python -m pstats {args.profile})")